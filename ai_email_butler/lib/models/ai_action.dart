@@ -36,6 +36,47 @@ class AiActionSuggestion {
   }
 }
 
+/// One server-sent event from the streaming suggest-action endpoint.
+/// [type] is 'field' (a decided field such as 'action'), 'reply_delta'
+/// (the next piece of the reply text), 'done' (the full suggestion) or 'error'.
+class SuggestionStreamEvent {
+  final String type;
+  final Map<String, dynamic> data;
+
+  SuggestionStreamEvent({required this.type, required this.data});
+
+  String? get replyDelta => type == 'reply_delta' ? data['text'] as String? : null;
+
+  AiActionSuggestion? get suggestion => type == 'done' ? AiActionSuggestion.fromJson(data) : null;
+}
+
+class BatchSuggestionResult {
+  final int index;
+  final int statusCode;
+  final AiActionSuggestion? result;
+  final String? error;
+
+  BatchSuggestionResult({
+    required this.index,
+    required this.statusCode,
+    this.result,
+    this.error,
+  });
+
+  bool get isSuccess => statusCode == 200 && result != null;
+
+  factory BatchSuggestionResult.fromJson(Map<String, dynamic> json) {
+    return BatchSuggestionResult(
+      index: json['index'] as int,
+      statusCode: json['status_code'] as int,
+      result: json['result'] == null
+          ? null
+          : AiActionSuggestion.fromJson(json['result'] as Map<String, dynamic>),
+      error: json['error'] as String?,
+    );
+  }
+}
+
 class EmailContext {
   final String subject;
   final String body;
@@ -43,6 +84,7 @@ class EmailContext {
   final String? threadHistory;
   final String userId;
   final String workflowRules;
+  final String? actionMode;
 
   EmailContext({
     required this.subject,
@@ -51,6 +93,7 @@ class EmailContext {
     this.threadHistory,
     required this.userId,
     required this.workflowRules,
+    this.actionMode,
   });
 
   Map<String, dynamic> toJson() {
@@ -61,6 +104,7 @@ class EmailContext {
       'thread_history': threadHistory,
       'user_id': userId,
       'workflow_rules': workflowRules,
+      'action_mode': actionMode,
     };
   }
 }
@@ -39,6 +39,73 @@ class ApiService {
     }
   }
 
+  /// Streams the AI suggestion for one email over SSE. The action decision
+  /// arrives as 'field' events before the reply text, which follows as
+  /// 'reply_delta' events; the stream ends with a 'done' or 'error' event.
+  Stream<SuggestionStreamEvent> suggestActionStream(EmailContext context) async* {
+    final url = Uri.parse('$_baseUrl/api/v1/ai/suggest-action/stream');
+    final request = http.Request('POST', url)
+      ..headers['Content-Type'] = 'application/json'
+      ..headers['Accept'] = 'text/event-stream'
+      ..body = jsonEncode(context.toJson());
+
+    final client = http.Client();
+    try {
+      final response = await client.send(request);
+      if (response.statusCode != 200) {
+        final body = await response.stream.bytesToString();
+        throw Exception('Failed to stream AI suggestion. Status: ${response.statusCode}. Body: $body');
+      }
+
+      String? eventType;
+      final lines = response.stream
+          .transform(utf8.decoder)
+          .transform(const LineSplitter());
+      await for (final line in lines) {
+        if (line.startsWith('event: ')) {
+          eventType = line.substring('event: '.length);
+        } else if (line.startsWith('data: ') && eventType != null) {
+          yield SuggestionStreamEvent(
+            type: eventType,
+            data: jsonDecode(line.substring('data: '.length)) as Map<String, dynamic>,
+          );
+          if (eventType == 'done' || eventType == 'error') break;
+        }
+      }
+    } finally {
+      client.close();
+    }
+  }
+
+  /// Triages a whole batch of emails in a single request.
+  /// Results arrive as NDJSON in completion order; use [BatchSuggestionResult.index]
+  /// to match each one back to its email. Failed emails yield a result with an error.
+  Stream<BatchSuggestionResult> suggestActions(List<EmailContext> contexts) async* {
+    final url = Uri.parse('$_baseUrl/api/v1/ai/suggest-actions?format=ndjson');
+    final request = http.Request('POST', url)
+      ..headers['Content-Type'] = 'application/json'
+      ..body = jsonEncode(contexts.map((c) => c.toJson()).toList());
+
+    final client = http.Client();
+    try {
+      final response = await client.send(request);
+      if (response.statusCode != 200) {
+        final body = await response.stream.bytesToString();
+        throw Exception('Failed to get AI suggestions. Status: ${response.statusCode}. Body: $body');
+      }
+
+      final lines = response.stream
+          .transform(utf8.decoder)
+          .transform(const LineSplitter());
+      await for (final line in lines) {
+        if (line.trim().isEmpty) continue;
+        yield BatchSuggestionResult.fromJson(jsonDecode(line));
+      }
+    } finally {
+      client.close();
+    }
+  }
+
   // Mock function for user status
   Future<Map<String, dynamic>> getUserStatus() async {
     final url = Uri.parse('$_baseUrl/api/v1/user/status?user_id=$_userId');
@@ -0,0 +1,59 @@
+import json
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+# OpenAI Batch API endpoint used for offline suggest-action jobs
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+
+
+def build_batch_jsonl(requests: list[tuple[str, dict]]) -> bytes:
+    """Encodes (custom_id, chat completion body) pairs as a Batch API input file."""
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body})
+        for custom_id, body in requests
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def submit_batch(client: AsyncOpenAI, jsonl: bytes, metadata: Optional[dict] = None):
+    """Uploads the JSONL input file and creates the batch job."""
+    input_file = await client.files.create(file=("suggest_actions.jsonl", jsonl), purpose="batch")
+    return await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata=metadata,
+    )
+
+
+async def fetch_batch_results(client: AsyncOpenAI, batch) -> dict[str, dict]:
+    """
+    Downloads the output and error files of a finished batch.
+    Returns a mapping of custom_id to either {"arguments": str} or {"error": str}.
+    """
+    results: dict[str, dict] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            results[record["custom_id"]] = _parse_record(record)
+    return results
+
+
+def _parse_record(record: dict) -> dict:
+    """Extracts the suggest_action tool-call arguments from one batch output record."""
+    if record.get("error"):
+        return {"error": record["error"].get("message", "Batch request failed.")}
+    response = record.get("response") or {}
+    if response.get("status_code") != 200:
+        return {"error": f"Upstream returned status {response.get('status_code')}."}
+    tool_calls = response["body"]["choices"][0]["message"].get("tool_calls")
+    if not tool_calls:
+        return {"error": "AI failed to return a structured JSON response."}
+    return {"arguments": tool_calls[0]["function"]["arguments"]}
@@ -0,0 +1,93 @@
+"""
+Wall-clock comparison of whole-inbox triage strategies against the stub server:
+
+  - single:  one POST /api/v1/ai/suggest-action per email, sequentially (current client)
+  - stream:  one POST /api/v1/ai/suggest-actions, results streamed as NDJSON
+  - offline: POST /api/v1/ai/batches, then poll until the Batch API job completes
+
+    cd backend && python benchmarks/bench_batch.py --emails 100 --latency 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+
+def build_inbox(emails: int) -> list[dict]:
+    return [
+        {
+            "subject": f"Question about order #{1000 + i}",
+            "body": f"Hello, could you confirm the delivery date for order #{1000 + i}? Thanks!",
+            "sender": f"customer{i}@example.com",
+            "thread_history": None,
+            "user_id": "bench_user",
+            "workflow_rules": "Draft replies for customer questions.",
+        }
+        for i in range(emails)
+    ]
+
+
+async def run_single(client: httpx.AsyncClient, inbox: list[dict]) -> int:
+    ok = 0
+    for email in inbox:
+        response = await client.post("/api/v1/ai/suggest-action", json=email)
+        ok += response.status_code == 200
+    return ok
+
+
+async def run_stream(client: httpx.AsyncClient, inbox: list[dict]) -> int:
+    ok = 0
+    async with client.stream("POST", "/api/v1/ai/suggest-actions", json=inbox) as response:
+        async for line in response.aiter_lines():
+            if line:
+                ok += json.loads(line)["status_code"] == 200
+    return ok
+
+
+async def run_offline(client: httpx.AsyncClient, inbox: list[dict]) -> int:
+    job = (await client.post("/api/v1/ai/batches", json=inbox)).json()
+    while True:
+        status = (await client.get(f"/api/v1/ai/batches/{job['batch_id']}")).json()
+        if status["status"] == "completed":
+            return sum(item["status_code"] == 200 for item in status["results"])
+        await asyncio.sleep(0.05)
+
+
+async def main(args):
+    port = free_port()
+    stub = start_stub_server(port, latency=args.latency)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("AI_CACHE_ENABLED", "false")
+
+    import main as backend
+
+    inbox = build_inbox(args.emails)
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=600) as client:
+        print(f"Emails: {args.emails}, upstream latency: {args.latency * 1000:.0f} ms, "
+              f"AI_BATCH_USER_CONCURRENCY={backend.AI_BATCH_USER_CONCURRENCY}")
+        print(f"{'mode':>8} {'ok':>5} {'seconds':>8} {'emails/s':>9}")
+        for name, runner in (("single", run_single), ("stream", run_stream), ("offline", run_offline)):
+            start = time.perf_counter()
+            ok = await runner(client, inbox)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>8} {ok:>5} {elapsed:>8.2f} {args.emails / elapsed:>9.1f}")
+
+    await backend.llm.aclose()
+    stub.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated upstream latency in seconds.")
+    parser.add_argument("--emails", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Response cache benchmark for /api/v1/ai/suggest-action.
+
+Replays a corpus where a fraction of emails are repeats (newsletters,
+notifications, re-sent messages) and reports how many upstream calls the
+cache and in-flight coalescing saved.
+
+    cd backend && python benchmarks/bench_cache.py --emails 200 --unique 40
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+
+def build_corpus(emails: int, unique: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    templates = [
+        {
+            "subject": f"Weekly digest #{i}",
+            "body": f"Here is your weekly summary number {i}.\n\nUnsubscribe at any time.",
+            "sender": f"noreply@news{i % 5}.example.com",
+            "thread_history": None,
+            "user_id": "bench_user",
+            "workflow_rules": "Archive newsletters.",
+        }
+        for i in range(unique)
+    ]
+    return [dict(rng.choice(templates)) for _ in range(emails)]
+
+
+async def main(args):
+    port = free_port()
+    stub = start_stub_server(port, latency=args.latency)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import main as backend
+
+    corpus = build_corpus(args.emails, args.unique)
+    gate = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=120) as client:
+
+        async def one(email: dict):
+            async with gate:
+                response = await client.post("/api/v1/ai/suggest-action", json=email)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(email) for email in corpus))
+        elapsed = time.perf_counter() - start
+        stats = (await client.get("/api/v1/ai/cache/stats")).json()
+
+    upstream_calls = stub.config.app.state.request_count
+    print(f"Emails: {args.emails} ({args.unique} unique), concurrency {args.concurrency}")
+    print(f"Upstream calls: {upstream_calls} (saved {args.emails - upstream_calls})")
+    print(f"Wall clock: {elapsed:.2f} s, {args.emails / elapsed:.1f} emails/s")
+    print(f"Cache stats: {stats}")
+
+    await backend.llm.aclose()
+    stub.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated upstream latency in seconds.")
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--unique", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
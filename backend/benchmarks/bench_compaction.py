@@ -0,0 +1,54 @@
+"""
+Prompt compaction benchmark over a corpus of realistic emails (plain notes,
+Gmail/Outlook reply chains, signatures with disclaimers, HTML newsletters,
+bodies repeating the thread history).
+
+Reports the median prompt-size reduction and the CPU cost of the stage.
+
+    cd backend && python benchmarks/bench_compaction.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_compaction import compact_email, load_tokenizer  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "emails.jsonl")
+
+
+def main(args):
+    with open(args.corpus) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    tokenizer = load_tokenizer(args.model)
+    # Timings depend heavily on the tokenizer, so always report which one was used
+    print(f"Tokenizer: {'tiktoken' if tokenizer._encoding is not None else 'character estimate (tiktoken encodings unavailable)'}")
+
+    reductions, timings = [], []
+    total_before = total_after = 0
+    for email in corpus:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = compact_email(email["body"], email["thread_history"], args.model)
+        timings.append((time.perf_counter() - start) / args.repeat * 1_000_000)
+        reductions.append(1 - result.tokens_after / result.tokens_before)
+        total_before += result.tokens_before
+        total_after += result.tokens_after
+
+    print(f"Emails: {len(corpus)}")
+    print(f"Tokens before: {total_before}, after: {total_after} ({1 - total_after / total_before:.1%} total reduction)")
+    print(f"Median reduction per email: {statistics.median(reductions):.1%}")
+    print(f"CPU per email: median {statistics.median(timings):.0f} us, max {max(timings):.0f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
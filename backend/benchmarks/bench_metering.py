@@ -0,0 +1,69 @@
+"""
+Microbenchmark of the request-path cost of usage metering.
+
+"sync" writes each event to SQLite in its own transaction, as a naive
+per-request implementation would; "queued" records events through the
+MeteringPipeline, which only enqueues them and writes in background batches.
+Reports the time spent on the request path per event and the total time
+until every event is durable.
+
+    cd backend && python benchmarks/bench_metering.py --events 20000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metering import ActionLogEvent, MeteringPipeline, MeteringStore, UsageEvent, current_month  # noqa: E402
+
+
+def make_events(count: int) -> list:
+    events = []
+    for i in range(count):
+        user_id = f"user_{i % 50}"
+        if i % 2:
+            events.append(ActionLogEvent(user_id=user_id, suggested_action="draft_reply", status="pending_review"))
+        else:
+            events.append(UsageEvent(user_id=user_id, source="ai", email_count=1, prompt_tokens=600, completion_tokens=90))
+    return events
+
+
+async def bench_sync(store: MeteringStore, events: list) -> tuple[float, float]:
+    start = time.perf_counter()
+    for event in events:
+        store.write_batch([event])
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def bench_queued(store: MeteringStore, events: list) -> tuple[float, float]:
+    pipeline = MeteringPipeline(store, queue_size=len(events))
+    pipeline.start()
+    start = time.perf_counter()
+    for event in events:
+        pipeline.record(event)
+    request_path = time.perf_counter() - start
+    await pipeline.stop()
+    return request_path, time.perf_counter() - start
+
+
+async def main(args):
+    events = make_events(args.events)
+    print(f"{'mode':>7} {'us/event':>9} {'durable_s':>9} {'emails_user_0':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in (("sync", bench_sync), ("queued", bench_queued)):
+            store = MeteringStore(os.path.join(tmp, f"{name}.db"))
+            request_path, durable = await bench(store, events)
+            emails = store.monthly_usage("user_0", current_month())["email_count"]
+            store.close()
+            print(f"{name:>7} {request_path / len(events) * 1_000_000:>9.1f} {durable:>9.2f} {emails:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Microbenchmark of per-request prompt assembly CPU in suggest-action.
+
+"before" re-implements the original handler path (rebuilding the tool schema
+and rendering the persona/system prompt f-strings on every request); "after"
+uses the precomputed PromptBuilder. Prompt compaction is disabled so only
+prompt assembly is measured. Also reports how much of the serialized request
+is a byte-identical prefix shared by two different users.
+
+    cd backend && python benchmarks/bench_prompt_build.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ["AI_PROMPT_COMPACTION_ENABLED"] = "false"
+
+import main as backend  # noqa: E402
+
+
+def legacy_build_request(context: backend.EmailContext) -> dict:
+    """The handler's original prompt assembly, kept here as the baseline."""
+    persona = (
+        "You are a professional, concise, and friendly assistant. "
+        "Your tone should be helpful and to the point. "
+        "Always use a polite closing. "
+        "Your primary goal is to save the user time."
+    )
+    system_prompt = f"""
+    You are an expert AI Email Automation Agent. Your task is to analyze an incoming email and suggest the best action, including a draft reply if necessary.
+
+    **User Persona:** {persona}
+
+    **Workflow Rules:** The user has provided the following specific rules for this email: \"{context.workflow_rules}\". You must adhere to these rules.
+
+    **Output Requirement:** You MUST respond with a single JSON object that strictly adheres to the provided JSON schema. DO NOT include any other text, explanation, or markdown formatting outside of the JSON object.
+    """
+    user_message = f"""
+    **Incoming Email Details:**
+    - Subject: {context.subject}
+    - Sender: {context.sender}
+    - Body:
+    ---
+    {context.body}
+    ---
+
+    **Thread History (if available):**
+    ---
+    {context.thread_history or "N/A"}
+    ---
+
+    Analyze the email and the user's rules, then generate the structured JSON action suggestion.
+    """
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message},
+        ],
+        "tools": [{
+            "type": "function",
+            "function": {
+                "name": "suggest_action",
+                "description": "Suggests an action and a draft reply for an incoming email based on user rules and context.",
+                "parameters": backend.AIActionSuggestion.model_json_schema(),
+            },
+        }],
+        "tool_choice": {"type": "function", "function": {"name": "suggest_action"}},
+    }
+
+
+def new_build_request(context: backend.EmailContext) -> dict:
+    system_prompt = backend.get_system_prompt(context.user_id, context.workflow_rules)
+    return backend.build_chat_request(context, system_prompt, backend.OPENAI_MODEL, context.body, context.thread_history)
+
+
+def shared_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def main(args):
+    contexts = [
+        backend.EmailContext(
+            subject=f"Question {i}",
+            body="Hi, could you confirm the delivery date for my order? Thanks!",
+            sender=f"customer{i}@example.com",
+            user_id=f"user_{i % 8}",
+            workflow_rules=f"Rules for user {i % 8}: draft replies for customer questions.",
+        )
+        for i in range(64)
+    ]
+
+    print(f"{'path':>7} {'us/request':>10}")
+    for name, build in (("before", legacy_build_request), ("after", new_build_request)):
+        build(contexts[0])  # Warm up
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            build(contexts[i % len(contexts)])
+        per_request = (time.perf_counter() - start) / args.iterations * 1_000_000
+        print(f"{name:>7} {per_request:>10.1f}")
+
+    print()
+    for name, build in (("before", legacy_build_request), ("after", new_build_request)):
+        first, second = (json.dumps({k: build(c)[k] for k in ("tools", "messages")}) for c in (contexts[0], contexts[1]))
+        prefix = shared_prefix(first, second)
+        print(f"{name}: {prefix} of {len(first)} request bytes shared across users ({prefix / len(first):.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+"""
+Benchmark of model routing, confidence escalation and hedged requests against stub servers.
+
+Routing: replays the email corpus with every email on the fast model, every
+email on the strong model, and with routing plus escalation (the stub answers
+a fraction of requests with low confidence). Reports upstream calls per model,
+low-confidence answers returned and estimated cost per 1k emails.
+
+Hedging: the primary stub answers a fraction of requests with an injected
+delay; compares latency percentiles without and with hedging to a second stub.
+
+    cd backend && python benchmarks/bench_router.py --low-confidence 0.15 --slow-fraction 0.03
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "emails.jsonl")
+
+
+def load_corpus() -> list[dict]:
+    with open(CORPUS, encoding="utf-8") as f:
+        emails = [json.loads(line) for line in f if line.strip()]
+    # Every fifth email comes from an auto-send workflow
+    for i, email in enumerate(emails):
+        email["action_mode"] = "auto_send" if i % 5 == 0 else "draft_only"
+    return emails
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def replay(client: httpx.AsyncClient, emails: list[dict], concurrency: int) -> tuple[list[float], list[float]]:
+    """Posts every email; returns (latencies in seconds, confidences)."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies, confidences = [], []
+
+    async def one(email):
+        async with gate:
+            start = time.perf_counter()
+            response = await client.post("/api/v1/ai/suggest-action", json=email)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            confidences.append(response.json()["confidence"])
+
+    await asyncio.gather(*(one(e) for e in emails))
+    return latencies, confidences
+
+
+async def main(args):
+    primary = start_stub_server(
+        free_port(),
+        latency=args.latency,
+        slow_fraction=args.slow_fraction,
+        slow_latency=args.slow_latency,
+        low_confidence_fraction=args.low_confidence,
+    )
+    secondary = start_stub_server(free_port(), latency=args.latency)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{primary.config.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("AI_CACHE_ENABLED", "false")
+
+    import main as backend
+    from llm_client import LLMClient
+    from model_router import ModelRouter
+
+    emails = load_corpus() * args.repeat
+    fast, strong = backend.OPENAI_MODEL, backend.router.strong_model
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=120) as client:
+        print(f"Routing: {len(emails)} emails, {args.low_confidence:.0%} low-confidence answers from the stub")
+        print(f"{'mode':>7} {'fast_calls':>10} {'strong_calls':>12} {'low_conf_out':>12} {'usd_per_1k':>10}")
+        for name, fast_model, enabled in (("fast", fast, False), ("strong", strong, False), ("routed", fast, True)):
+            backend.router = ModelRouter(backend.llm, None, fast_model=fast_model, enabled=enabled)
+            _, confidences = await replay(client, emails, args.concurrency)
+            models = backend.router.stats()["models"]
+            calls = {m: models.get(m, {}).get("requests", 0) for m in (fast, strong)}
+            cost = sum(m["cost_usd"] for m in models.values())
+            low = sum(1 for c in confidences if c < backend.router.escalation_confidence)
+            print(f"{name:>7} {calls[fast]:>10} {calls[strong]:>12} {low:>12} {cost / len(emails) * 1000:>10.4f}")
+
+        print()
+        print(f"Hedging: {args.slow_fraction:.0%} of primary calls delayed by {args.slow_latency * 1000:.0f} ms")
+        print(f"{'mode':>7} {'p50_ms':>7} {'p95_ms':>7} {'p99_ms':>7} {'max_ms':>7} {'hedged':>6} {'hedge_wins':>10}")
+        hedge_llm = LLMClient(api_key="stub", base_url=f"http://127.0.0.1:{secondary.config.port}/v1")
+        for name, hedge_client in (("off", None), ("on", hedge_llm)):
+            backend.router = ModelRouter(backend.llm, hedge_client, fast_model=fast, enabled=False)
+            latencies, _ = await replay(client, emails, args.concurrency)
+            stats = backend.router.stats()["models"][fast]
+            p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99))
+            print(f"{name:>7} {p50:>7.0f} {p95:>7.0f} {p99:>7.0f} {max(latencies) * 1000:>7.0f} "
+                  f"{stats['hedged']:>6} {stats['hedge_wins']:>10}")
+        await hedge_llm.aclose()
+
+    await backend.llm.aclose()
+    primary.should_exit = True
+    secondary.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated upstream latency in seconds.")
+    parser.add_argument("--low-confidence", type=float, default=0.15, help="Fraction of low-confidence answers.")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="Fraction of primary calls that are slow.")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Extra delay of slow calls in seconds.")
+    parser.add_argument("--repeat", type=int, default=5, help="Times to replay the corpus.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
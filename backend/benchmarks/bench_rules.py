@@ -0,0 +1,77 @@
+"""
+Microbenchmark for the local workflow rule engine.
+
+Compiles a synthetic rule set and reports the per-email evaluation time and
+the fraction of a mixed inbox that is decided without calling the AI.
+
+    cd backend && python benchmarks/bench_rules.py --rules 500 --emails 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rule_engine import RuleEngine  # noqa: E402
+
+
+def build_workflows(count: int, rng: random.Random) -> list[dict]:
+    workflows = [
+        {"workflow_id": "noreply", "action": "archive", "action_mode": "auto_send", "rules": [{"if_sender": "noreply@"}]},
+    ]
+    for i in range(count):
+        rule = {"if_sender": f"vendor{i}.example.com"}
+        if i % 3 == 0:
+            rule["if_subject_contains"] = f"invoice {i}"
+        if i % 5 == 0:
+            rule["if_body_contains"] = f"account {i}"
+        workflows.append({
+            "workflow_id": f"wf_{i}",
+            "action": rng.choice(["archive", "flag_for_review"]),
+            "rules": [rule],
+        })
+    return workflows
+
+
+def build_inbox(count: int, rules: int, rng: random.Random) -> list[tuple[str, str, str]]:
+    filler = "Thanks for your message. " * 40
+    inbox = []
+    for _ in range(count):
+        i = rng.randrange(rules)
+        kind = rng.random()
+        if kind < 0.2:
+            inbox.append(("Your weekly update", "noreply@service.com", filler))
+        elif kind < 0.5:
+            inbox.append((f"Invoice {i} attached", f"billing@mail.vendor{i}.example.com", filler + f" Account {i}."))
+        else:
+            inbox.append(("Lunch tomorrow?", f"friend{i}@gmail.com", filler))
+    return inbox
+
+
+def main(args):
+    rng = random.Random(42)
+    engine = RuleEngine()
+
+    start = time.perf_counter()
+    local_rules = engine.sync("bench_user", build_workflows(args.rules, rng))
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    inbox = build_inbox(args.emails, args.rules, rng)
+    start = time.perf_counter()
+    for subject, sender, body in inbox:
+        engine.evaluate("bench_user", subject, sender, body)
+    per_email_us = (time.perf_counter() - start) / len(inbox) * 1_000_000
+
+    stats = engine.stats()
+    print(f"Compiled {local_rules} local rules in {compile_ms:.1f} ms")
+    print(f"Evaluated {stats['evaluated']} emails: {per_email_us:.1f} us/email")
+    print(f"Served locally: {stats['served_locally']} ({stats['local_fraction']:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--emails", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""
+Latency benchmark for streamed vs. buffered suggest-action against the stub server.
+
+Runs the backend under uvicorn and reports, for each endpoint, the time to
+first byte, the time until the action decision is known, and the total time.
+
+    cd backend && python benchmarks/bench_streaming.py --latency 0.3 --token-delay 0.02
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import threading
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+SAMPLE_EMAIL = {
+    "subject": "Meeting next week?",
+    "body": "Hi, are you free on Tuesday afternoon to go over the Q3 numbers?",
+    "sender": "alice@example.com",
+    "thread_history": None,
+    "user_id": "bench_user",
+    "workflow_rules": "Always draft a reply for known clients.",
+}
+
+
+async def measure_buffered(client: httpx.AsyncClient) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    async with client.stream("POST", "/api/v1/ai/suggest-action", json=SAMPLE_EMAIL) as response:
+        first_byte = None
+        async for _ in response.aiter_bytes():
+            first_byte = first_byte or time.perf_counter()
+    end = time.perf_counter()
+    # The action is only known once the whole JSON response has arrived
+    return first_byte - start, end - start, end - start
+
+
+async def measure_streamed(client: httpx.AsyncClient) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    first_byte = decision = None
+    async with client.stream("POST", "/api/v1/ai/suggest-action/stream", json=SAMPLE_EMAIL) as response:
+        event = None
+        async for line in response.aiter_lines():
+            first_byte = first_byte or time.perf_counter()
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "field" and "action" in json.loads(line[len("data: "):]):
+                decision = time.perf_counter()
+    end = time.perf_counter()
+    return first_byte - start, decision - start, end - start
+
+
+async def main(args):
+    stub = start_stub_server(free_port(), latency=args.latency, token_delay=args.token_delay)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{stub.config.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("AI_CACHE_ENABLED", "false")
+
+    import main as backend
+
+    backend_port = free_port()
+    server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=backend_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    print(f"Stub: {args.latency * 1000:.0f} ms to first token, {args.token_delay * 1000:.0f} ms per token")
+    print(f"{'endpoint':>9} {'ttfb_ms':>8} {'decision_ms':>11} {'total_ms':>8}")
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{backend_port}", timeout=60) as client:
+        for name, measure in (("buffered", measure_buffered), ("streamed", measure_streamed)):
+            samples = [await measure(client) for _ in range(args.runs)]
+            ttfb, decision, total = (statistics.median(s[i] for s in samples) * 1000 for i in range(3))
+            print(f"{name:>9} {ttfb:>8.0f} {decision:>11.0f} {total:>8.0f}")
+
+    server.should_exit = True
+    stub.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated time to first token in seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Simulated time per token in seconds.")
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Throughput benchmark for /api/v1/ai/suggest-action against the local stub server.
+
+Runs the backend in-process and sends batches of requests at increasing
+concurrency. With a non-blocking upstream client, requests/second should grow
+roughly linearly with concurrency until AI_MAX_CONCURRENCY is reached.
+
+    cd backend && python benchmarks/bench_suggest_action.py --latency 0.2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+SAMPLE_EMAIL = {
+    "subject": "Meeting next week?",
+    "body": "Hi, are you free on Tuesday afternoon to go over the Q3 numbers?",
+    "sender": "alice@example.com",
+    "thread_history": None,
+    "user_id": "bench_user",
+    "workflow_rules": "Always draft a reply for known clients.",
+}
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int) -> tuple[float, int, float]:
+    """Sends `total` requests with at most `concurrency` in flight. Returns (rps, errors, health_ms)."""
+    gate = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with gate:
+            response = await client.post("/api/v1/ai/suggest-action", json=SAMPLE_EMAIL)
+            if response.status_code != 200:
+                errors += 1
+
+    async def health_probe() -> float:
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await client.get("/")
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    results = await asyncio.gather(health_probe(), *(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, errors, results[0]
+
+
+async def main(args):
+    port = free_port()
+    stub = start_stub_server(port, latency=args.latency)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # Identical sample emails would otherwise be served from the response cache
+    os.environ.setdefault("AI_CACHE_ENABLED", "false")
+
+    import main as backend
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=120) as client:
+        print(f"Upstream latency: {args.latency * 1000:.0f} ms, AI_MAX_CONCURRENCY={backend.llm.max_concurrency}")
+        print(f"{'concurrency':>11} {'requests':>8} {'rps':>8} {'errors':>6} {'health_ms':>9}")
+        for concurrency in args.levels:
+            total = max(args.requests, concurrency * 2)
+            rps, errors, health_ms = await run_level(client, concurrency, total)
+            print(f"{concurrency:>11} {total:>8} {rps:>8.1f} {errors:>6} {health_ms:>9.1f}")
+
+    await backend.llm.aclose()
+    stub.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated upstream latency in seconds.")
+    parser.add_argument("--requests", type=int, default=32, help="Minimum requests per concurrency level.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,212 @@
+"""
+End-to-end load test that replays an EmailContext corpus against the backend.
+
+By default it starts the stub OpenAI server (with the given latency and token
+rate) and the backend under uvicorn, so requests go through real HTTP and the
+metrics middleware. Use --url to target an already running backend instead.
+
+Reports requests/second, client-side p50/p95/p99 latency, errors by status,
+estimated upstream cost per 1k emails and the mean time per suggest-action
+stage (all read from /metrics). With --baseline, exits non-zero when RPS or
+p95 regress by more than --max-regression against an earlier --output file.
+
+    cd backend && python benchmarks/load_test.py --endpoint suggest-action --concurrency 32 --requests 500
+    cd backend && python benchmarks/load_test.py --output baseline.json
+    cd backend && python benchmarks/load_test.py --baseline baseline.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_openai_server import free_port, start_stub_server  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "emails.jsonl")
+ENDPOINTS = {
+    "suggest-action": "/api/v1/ai/suggest-action",
+    "suggest-action-stream": "/api/v1/ai/suggest-action/stream",
+    "suggest-actions": "/api/v1/ai/suggest-actions",
+}
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def parse_metrics(text: str) -> dict[str, float]:
+    """Parses Prometheus text into {'name{labels}': value}."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def metric_delta(before: dict, after: dict, prefix: str) -> dict[str, float]:
+    return {k: after[k] - before.get(k, 0.0) for k in after if k.startswith(prefix)}
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, payload) -> tuple[int, bool]:
+    """Sends one request and reads the full response. Returns (status, failed)."""
+    async with client.stream("POST", ENDPOINTS[endpoint], json=payload) as response:
+        body = await response.aread()
+    if endpoint == "suggest-action-stream":
+        # Failures are reported in-band as an SSE error event
+        return response.status_code, b"event: error" in body
+    if endpoint == "suggest-actions":
+        items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        return response.status_code, any(item["status_code"] != 200 for item in items)
+    return response.status_code, response.status_code != 200
+
+
+async def run_load(client: httpx.AsyncClient, args, corpus: list[dict]) -> dict:
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    failed = 0
+
+    async def one(i: int):
+        nonlocal failed
+        if args.endpoint == "suggest-actions":
+            payload = [corpus[(i * args.batch_size + j) % len(corpus)] for j in range(args.batch_size)]
+        else:
+            payload = corpus[i % len(corpus)]
+        async with gate:
+            start = time.perf_counter()
+            try:
+                status, item_failed = await send(client, args.endpoint, payload)
+            except httpx.HTTPError as e:
+                status, item_failed = type(e).__name__, True
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            failed += item_failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    emails = args.requests * (args.batch_size if args.endpoint == "suggest-actions" else 1)
+    return {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "emails": emails,
+        "seconds": elapsed,
+        "rps": args.requests / elapsed,
+        "emails_per_second": emails / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "failed": failed,
+        "statuses": statuses,
+    }
+
+
+def report(result: dict, before: dict, after: dict) -> None:
+    cost = sum(metric_delta(before, after, "ai_model_cost_usd_total").values())
+    result["usd_per_1k_emails"] = cost / result["emails"] * 1000
+    print(f"{result['endpoint']}: {result['requests']} requests ({result['emails']} emails), "
+          f"concurrency {result['concurrency']}, {result['seconds']:.1f}s")
+    print(f"  rps {result['rps']:.1f}  emails/s {result['emails_per_second']:.1f}")
+    print(f"  latency p50 {result['p50_ms']:.0f} ms  p95 {result['p95_ms']:.0f} ms  p99 {result['p99_ms']:.0f} ms")
+    print(f"  statuses {result['statuses']}  failed {result['failed']}")
+    print(f"  est. upstream cost per 1k emails: ${result['usd_per_1k_emails']:.4f}")
+
+    sums = metric_delta(before, after, "suggest_action_stage_seconds_sum")
+    counts = metric_delta(before, after, "suggest_action_stage_seconds_count")
+    stages = {}
+    for key, total in sums.items():
+        count = counts.get(key.replace("_sum", "_count"), 0)
+        if count:
+            stages[key.split('stage="')[1].rstrip('"}')] = total / count * 1000
+    result["stage_mean_ms"] = stages
+    if stages:
+        print("  mean stage time: " + "  ".join(f"{stage} {ms:.2f} ms" for stage, ms in stages.items()))
+
+
+def check_regression(result: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    if result["rps"] < baseline["rps"] * (1 - max_regression):
+        regressions.append(f"rps {result['rps']:.1f} < baseline {baseline['rps']:.1f}")
+    if result["p95_ms"] > baseline["p95_ms"] * (1 + max_regression):
+        regressions.append(f"p95 {result['p95_ms']:.0f} ms > baseline {baseline['p95_ms']:.0f} ms")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return not regressions
+
+
+async def main(args) -> int:
+    corpus = load_corpus(args.corpus)
+    servers = []
+    base_url = args.url
+    if base_url is None:
+        stub = start_stub_server(
+            free_port(),
+            latency=args.latency,
+            token_delay=1 / args.tokens_per_second if args.tokens_per_second else 0.0,
+        )
+        servers.append(stub)
+        os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{stub.config.port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        # Replayed corpora repeat, so measure the uncached path unless asked otherwise
+        os.environ.setdefault("AI_CACHE_ENABLED", "true" if args.cache else "false")
+
+        import main as backend
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            await asyncio.sleep(0.01)
+        servers.append(server)
+        base_url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        before = parse_metrics((await client.get("/metrics")).text)
+        result = await run_load(client, args, corpus)
+        after = parse_metrics((await client.get("/metrics")).text)
+    report(result, before, after)
+
+    for server in servers:
+        server.should_exit = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline and not check_regression(result, args.baseline, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Backend base URL. Omit to start the stub and backend in-process.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL file of EmailContext objects.")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="suggest-action")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=20, help="Emails per request for suggest-actions.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub time to first token in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Stub generation rate (0 = instant).")
+    parser.add_argument("--cache", action="store_true", help="Keep the suggestion cache enabled.")
+    parser.add_argument("--output", help="Write the results as JSON (e.g. to use as a baseline).")
+    parser.add_argument("--baseline", help="Results JSON to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative RPS/p95 regression.")
+    sys.exit(asyncio.run(main(parser.parse_args())))
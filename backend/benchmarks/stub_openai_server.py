@@ -0,0 +1,248 @@
+"""
+Local OpenAI-compatible stub server for benchmarking the backend.
+
+Serves `/v1/chat/completions` with a canned `suggest_action` tool call after a
+configurable delay (streamed token by token when `stream=true`), plus the minimal `/v1/files` and `/v1/batches` endpoints
+needed for offline Batch API jobs. A fraction of completions can be made slow
+(to exercise hedging) or low-confidence (to exercise model escalation). Point the backend at it with:
+
+    OPENAI_API_BASE=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn main:app
+"""
+import time
+import json
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import threading
+
+import uvicorn
+from fastapi import FastAPI, Form, Request, Response, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_ARGUMENTS = {
+    "action": "draft_reply",
+    "confidence": 0.91,
+    "send_permission": "draft_only",
+    "reply_text": (
+        "Hi,\n\nThanks for reaching out. I've reviewed your message and I'm happy to help. "
+        "I'll take a closer look at the details today and get back to you with a full answer "
+        "by tomorrow afternoon. If anything is urgent in the meantime, feel free to call me.\n\nBest regards"
+    ),
+    "suggested_workflow_id": None,
+}
+LOW_CONFIDENCE = 0.42
+
+
+def completion_body(payload: dict, confidence: float = DEFAULT_ARGUMENTS["confidence"]) -> dict:
+    """Builds a chat completion response carrying the canned tool call."""
+    arguments = json.dumps({**DEFAULT_ARGUMENTS, "confidence": confidence})
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4
+    completion_tokens = len(arguments) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "gpt-4o-mini"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": "suggest_action", "arguments": arguments},
+                }],
+            },
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def argument_pieces(chars_per_token: int = 4) -> list[str]:
+    """Splits the canned tool-call arguments into token-sized pieces."""
+    arguments = json.dumps(DEFAULT_ARGUMENTS)
+    return [arguments[i:i + chars_per_token] for i in range(0, len(arguments), chars_per_token)]
+
+
+def stream_chunks(payload: dict, latency: float, token_delay: float):
+    """Yields SSE chat.completion.chunk events that stream the tool call piece by piece."""
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+    model = payload.get("model", "gpt-4o-mini")
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        body = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    async def generate():
+        await asyncio.sleep(latency)
+        yield chunk({"role": "assistant", "content": None, "tool_calls": [{
+            "index": 0,
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": "suggest_action", "arguments": ""},
+        }]})
+        for piece in argument_pieces():
+            await asyncio.sleep(token_delay)
+            yield chunk({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]})
+        yield chunk({}, finish_reason="tool_calls")
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            usage = completion_body(payload)["usage"]
+            yield f"data: {json.dumps({'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return generate()
+
+
+def create_stub_app(
+    latency: float = 0.2,
+    token_delay: float = 0.0,
+    slow_fraction: float = 0.0,
+    slow_latency: float = 0.0,
+    low_confidence_fraction: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Builds the stub app. `latency` is the simulated time to first token in
+    seconds and `token_delay` the time per generated token (about 4 characters).
+    Non-streamed completions take `slow_latency` extra seconds with probability
+    `slow_fraction` and report LOW_CONFIDENCE with probability `low_confidence_fraction`.
+    """
+    app = FastAPI(title="Stub OpenAI API")
+    app.state.request_count = 0
+    app.state.model_counts = {}
+    rng = random.Random(seed)
+    files: dict[str, dict] = {}
+    batches: dict[str, dict] = {}
+    background_tasks: set[asyncio.Task] = set()
+
+    def store_file(content: bytes, filename: str, purpose: str) -> dict:
+        file_id = f"file-{uuid.uuid4().hex}"
+        files[file_id] = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+            "content": content,
+        }
+        return files[file_id]
+
+    def public(record: dict) -> dict:
+        return {k: v for k, v in record.items() if k != "content"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        app.state.request_count += 1
+        model = payload.get("model", "gpt-4o-mini")
+        app.state.model_counts[model] = app.state.model_counts.get(model, 0) + 1
+        if payload.get("stream"):
+            return StreamingResponse(stream_chunks(payload, latency, token_delay), media_type="text/event-stream")
+        delay = latency + token_delay * len(argument_pieces())
+        if rng.random() < slow_fraction:
+            delay += slow_latency
+        confidence = LOW_CONFIDENCE if rng.random() < low_confidence_fraction else DEFAULT_ARGUMENTS["confidence"]
+        await asyncio.sleep(delay)
+        return completion_body(payload, confidence)
+
+    @app.post("/v1/files")
+    async def upload_file(file: UploadFile, purpose: str = Form(...)):
+        return public(store_file(await file.read(), file.filename or "upload.jsonl", purpose))
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        return Response(files[file_id]["content"], media_type="application/jsonl")
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        payload = await request.json()
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        lines = [json.loads(line) for line in files[payload["input_file_id"]]["content"].splitlines() if line.strip()]
+        batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": payload["endpoint"],
+            "input_file_id": payload["input_file_id"],
+            "completion_window": payload["completion_window"],
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+            "output_file_id": None,
+            "error_file_id": None,
+        }
+
+        async def run_batch():
+            # Batch jobs are processed as one unit after a single simulated latency
+            await asyncio.sleep(latency)
+            output = "\n".join(
+                json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": line["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion_body(line["body"])},
+                    "error": None,
+                })
+                for line in lines
+            )
+            output_file = store_file(output.encode("utf-8"), f"{batch_id}_output.jsonl", "batch_output")
+            batches[batch_id].update(
+                status="completed",
+                output_file_id=output_file["id"],
+                request_counts={"total": len(lines), "completed": len(lines), "failed": 0},
+            )
+
+        task = asyncio.create_task(run_batch())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        return batches[batch_id]
+
+    @app.get("/v1/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        if batch_id not in batches:
+            error = {"message": f"No batch found with id '{batch_id}'.", "type": "invalid_request_error", "code": None}
+            return JSONResponse({"error": error}, status_code=404)
+        return batches[batch_id]
+
+    return app
+
+
+def free_port() -> int:
+    """Returns an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_server(port: int, **options) -> uvicorn.Server:
+    """Starts the stub in a background thread (with its own event loop) and waits until it is ready."""
+    config = uvicorn.Config(create_stub_app(**options), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated time to first token in seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Simulated time per generated token in seconds.")
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(latency=args.latency, token_delay=args.token_delay), host="127.0.0.1", port=args.port)
@@ -0,0 +1,95 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# --- Configuration ---
+# Connection pool and backpressure settings for the upstream OpenAI API.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "64"))
+AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", "0.5"))
+
+
+class LLMSaturatedError(Exception):
+    """Raised when no upstream slot frees up within the queue timeout."""
+
+
+class LLMClient:
+    """
+    Shared async OpenAI client with a bounded connection pool and a
+    concurrency limit, so AI calls never block the event loop and excess
+    load is shed instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = AI_MAX_CONCURRENCY,
+        queue_timeout: float = AI_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            http_client=self.http_client,
+            max_retries=OPENAI_MAX_RETRIES,
+        )
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Reserves one upstream slot, raising LLMSaturatedError if none frees up in time."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMSaturatedError(
+                f"All {self.max_concurrency} AI slots are busy. Please retry shortly."
+            )
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def create_chat_completion(self, timeout: Optional[float] = None, **kwargs):
+        """Runs a chat completion inside a concurrency slot with a per-request timeout."""
+        async with self.slot():
+            return await self.client.chat.completions.create(
+                timeout=timeout or OPENAI_TIMEOUT_SECONDS,
+                **kwargs
+            )
+
+    async def stream_chat_completion(self, timeout: Optional[float] = None, **kwargs):
+        """Yields streamed chat completion chunks, holding one concurrency slot until the stream ends."""
+        async with self.slot():
+            stream = await self.client.chat.completions.create(
+                timeout=timeout or OPENAI_TIMEOUT_SECONDS,
+                stream=True,
+                **kwargs
+            )
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.close()
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections."""
+        await self.client.close()
@@ -1,36 +1,115 @@
 import os
 import json
-from typing import Optional
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Literal, Optional
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam, ChatCompletionToolParam
+import openai
+
+from batch_jobs import build_batch_jsonl, fetch_batch_results, submit_batch
+from llm_client import LLMClient, LLMSaturatedError
+from metering import ActionLogEvent, MeteringPipeline, MeteringStore, UsageEvent, current_month
+from metrics import Counter, Gauge, HistogramFamily, MetricsMiddleware, Registry, StageTimer, request_started
+from model_router import AI_HEDGE_API_BASE, AI_HEDGE_API_KEY, ModelRouter, Route
+from prompt_builder import PromptBuilder
+from profiler import PROFILER_ENABLED, collapsed, sample_thread
+from prompt_compaction import AI_PROMPT_COMPACTION_ENABLED, compact_email, compaction_stats, load_tokenizer
+from rule_engine import RuleEngine
+from streaming import DECISION_FIELDS, ToolArgumentsParser
+from suggestion_cache import AI_CACHE_ENABLED, SuggestionCache, make_cache_key
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 # Use the environment variables for OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # Cost-effective default (fast tier) model
+# Batch triage limits
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "1000"))
+AI_BATCH_USER_CONCURRENCY = int(os.getenv("AI_BATCH_USER_CONCURRENCY", "8"))
 
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment variables.")
 
-# Initialize OpenAI Client
-client = OpenAI(
+# Initialize the shared async OpenAI client (pooled connections + concurrency limit)
+llm = LLMClient(
     api_key=OPENAI_API_KEY,
     base_url=OPENAI_API_BASE if OPENAI_API_BASE else None
 )
 
+# Secondary endpoint that receives hedged duplicates of slow requests
+hedge_llm = LLMClient(
+    api_key=AI_HEDGE_API_KEY or OPENAI_API_KEY,
+    base_url=AI_HEDGE_API_BASE
+) if AI_HEDGE_API_BASE else None
+
+# Per-email model selection, confidence escalation and request hedging
+router = ModelRouter(llm, hedge_llm, fast_model=OPENAI_MODEL)
+
+# Response cache for AI suggestions (in-memory LRU, optional SQLite tier)
+suggestion_cache = SuggestionCache()
+
+# Compiled per-user workflow rules, populated by /api/v1/workflows/sync
+rule_engine = RuleEngine()
+
+# Usage events and action logs, written in batches by a background task
+metering = MeteringPipeline(MeteringStore())
+
+# Per-user concurrency caps for batch requests, and the number of batch items
+# holding or awaiting each one (a user's semaphore is dropped when it reaches 0)
+_batch_user_limits: dict[str, asyncio.Semaphore] = {}
+_batch_user_items: dict[str, int] = {}
+
+# Prometheus-style metrics served at /metrics
+metrics_registry = Registry()
+STAGE_SECONDS = metrics_registry.histogram(
+    "suggest_action_stage_seconds",
+    "Time spent in each stage of a suggest-action request.",
+    ("stage",)
+)
+PROMPT_TOKENS = metrics_registry.histogram(
+    "prompt_email_tokens",
+    "Email body plus thread history tokens per AI request, before and after compaction.",
+    ("stage",),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+AI_ERRORS = metrics_registry.counter("ai_errors_total", "Failed AI suggestions by error class.", ("error_class",))
+SUGGESTIONS = metrics_registry.counter("ai_suggestions_total", "Suggestions served, by source.", ("source",))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tokenizer encodings may be downloaded on first load, so keep that off the event loop
+    await asyncio.gather(*(asyncio.to_thread(load_tokenizer, model) for model in {router.fast_model, router.strong_model}))
+    metering.start()
+    yield
+    # Flush queued usage and action logs before exiting
+    await metering.stop()
+    metering.store.close()
+    # Release pooled upstream connections on shutdown
+    await llm.aclose()
+    if hedge_llm:
+        await hedge_llm.aclose()
+    suggestion_cache.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Email Automation Backend API",
     version="1.0.0",
-    description="Serverless API for managing AI-driven email workflows and OpenAI integration."
+    description="Serverless API for managing AI-driven email workflows and OpenAI integration.",
+    lifespan=lifespan
 )
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
 
 # --- Pydantic Schemas for API Request/Response ---
 
@@ -42,6 +121,7 @@ class EmailContext(BaseModel):
     thread_history: Optional[str] = Field(None, description="Summary of the email thread history.")
     user_id: str = Field(..., description="The ID of the user requesting the action.")
     workflow_rules: str = Field(..., description="User-defined rules for the workflow (e.g., auto-send, persona).")
+    action_mode: Optional[str] = Field(None, description="Action mode of the applicable workflow ('auto_send', 'draft_only'), if known.")
 
 class AIActionSuggestion(BaseModel):
     """Schema for the structured JSON output expected from the AI."""
@@ -51,6 +131,50 @@ class AIActionSuggestion(BaseModel):
     reply_text: Optional[str] = Field(None, description="The generated reply text, if action is 'draft_reply'.")
     suggested_workflow_id: Optional[str] = Field(None, description="The ID of the workflow rule that was triggered.")
 
+class Workflow(BaseModel):
+    """Schema for a user-defined workflow, as stored in the 'workflows' collection."""
+    workflow_id: str = Field(..., description="Unique ID of the workflow.")
+    name: str = Field("", description="User-friendly name (e.g., 'Sales Lead Follow-up').")
+    target_type: str = Field("email", description="'email', 'calendar_event', 'contact_update'.")
+    persona_config: dict = Field(default_factory=dict, description="Agent persona settings (e.g., tone, style).")
+    rules: list[dict] = Field(default_factory=list, description="Trigger conditions, e.g. {'if_sender': 'domain.com', 'if_subject_contains': 'invoice'}.")
+    action_mode: str = Field("draft_only", description="'auto_send', 'draft_only'.")
+    action: Optional[str] = Field(None, description="Fixed action when triggered (e.g., 'archive'). 'archive' and 'flag_for_review' are decided without the AI.")
+
+class ActionLog(BaseModel):
+    """Schema for an action log entry, as stored in the 'actions' collection."""
+    user_id: str = Field(..., description="The ID of the user.")
+    account_id: Optional[str] = Field(None, description="The connected account the action applies to.")
+    source_type: str = Field("email", description="'email', 'calendar', 'contact'.")
+    source_id: Optional[str] = Field(None, description="ID of the email/event/contact that triggered the action.")
+    suggested_action: str = Field(..., description="'draft_reply', 'schedule_meeting', 'tag_contact', etc.")
+    confidence: Optional[float] = Field(None, description="AI confidence score (0.0 to 1.0).")
+    status: str = Field(..., description="'pending_review', 'sent', 'drafted', 'rejected'.")
+
+class UsageReport(BaseModel):
+    """Schema for a usage record sent to /api/v1/billing/usage."""
+    user_id: str = Field(..., description="The ID of the user.")
+    email_count: int = Field(0, description="Number of emails processed.")
+    prompt_tokens: int = Field(0, description="Prompt tokens consumed.")
+    completion_tokens: int = Field(0, description="Completion tokens consumed.")
+    model: Optional[str] = Field(None, description="The model that consumed the tokens.")
+
+class BatchItemResult(BaseModel):
+    """Schema for one item of a batch suggest-action response."""
+    index: int = Field(..., description="Position of the email in the submitted batch.")
+    status_code: int = Field(..., description="HTTP-style status for this item (200 on success).")
+    result: Optional[AIActionSuggestion] = Field(None, description="The AI action suggestion, if successful.")
+    error: Optional[str] = Field(None, description="Error detail, if this item failed.")
+
+class BatchJobStatus(BaseModel):
+    """Schema for an offline (Batch API) suggest-action job."""
+    batch_id: str = Field(..., description="The ID of the batch job.")
+    status: str = Field(..., description="Batch status: 'validating', 'in_progress', 'completed', 'failed', etc.")
+    total: int = Field(0, description="Number of emails in the batch.")
+    completed: int = Field(0, description="Number of emails processed successfully so far.")
+    failed: int = Field(0, description="Number of emails that failed so far.")
+    results: Optional[list[BatchItemResult]] = Field(None, description="Per-email results, once the job has completed.")
+
 # --- Mock Database and Utility Functions (for MVP simulation) ---
 
 def get_user_persona(user_id: str) -> str:
@@ -64,30 +188,419 @@ def get_user_persona(user_id: str) -> str:
     )
 
 def get_system_prompt(user_id: str, workflow_rules: str) -> str:
-    """Constructs the full system prompt for the AI."""
-    persona = get_user_persona(user_id)
-    
-    system_prompt = f"""
-    You are an expert AI Email Automation Agent. Your task is to analyze an incoming email and suggest the best action, including a draft reply if necessary.
-    
-    **User Persona:** {persona}
-    
-    **Workflow Rules:** The user has provided the following specific rules for this email: \"{workflow_rules}\". You must adhere to these rules.
+    """
+    Returns the per-user part of the system prompt (persona and workflow rules).
+    The static instructions are sent separately as a shared prefix; see prompt_builder.py.
+    """
+    return prompt_builder.user_prompt(user_id, workflow_rules)
+
+# Tool schema and static prompt prefix are built once at startup
+prompt_builder = PromptBuilder(AIActionSuggestion.model_json_schema(), get_user_persona)
+
+# --- Metrics ---
+
+def time_stage(stage: str) -> StageTimer:
+    """Times one stage of a suggest-action request (e.g. `with time_stage("upstream"):`)."""
+    return StageTimer(STAGE_SECONDS, stage)
+
+def observe_parse_stage() -> None:
+    """Records the time from request arrival until the handler runs (body read and validation)."""
+    started = request_started.get()
+    if started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="parse")
+
+def collect_component_metrics() -> list:
+    """Exports the counters kept by the router, cache, rule engine, compaction and metering."""
+    model_labels = ("model",)
+    in_flight = Gauge("ai_upstream_in_flight", "AI calls currently holding an upstream slot.")
+    in_flight.set(llm.in_flight + (hedge_llm.in_flight if hedge_llm else 0))
+    routed = Counter("ai_model_routed_total", "Emails routed to each model.", model_labels)
+    requests = Counter("ai_model_requests_total", "Upstream chat completions per model.", model_labels)
+    errors = Counter("ai_model_errors_total", "Failed upstream chat completions per model.", model_labels)
+    hedged = Counter("ai_model_hedged_total", "Calls duplicated to the hedge endpoint.", model_labels)
+    hedge_wins = Counter("ai_model_hedge_wins_total", "Hedged calls answered first by the hedge endpoint.", model_labels)
+    escalations = Counter("ai_model_escalations_total", "Low-confidence answers re-run on a stronger model.", model_labels)
+    tokens = Counter("ai_tokens_total", "Upstream tokens consumed per model.", ("model", "kind"))
+    cost = Counter("ai_model_cost_usd_total", "Estimated upstream cost in USD per model.", model_labels)
+    latency = HistogramFamily("ai_upstream_latency_seconds", "Upstream chat completion latency per model.", model_labels)
+    for model, stats in router.model_stats().items():
+        routed.inc(stats.routed, model=model)
+        requests.inc(stats.requests, model=model)
+        errors.inc(stats.errors, model=model)
+        hedged.inc(stats.hedged, model=model)
+        hedge_wins.inc(stats.hedge_wins, model=model)
+        escalations.inc(stats.escalations, model=model)
+        tokens.inc(stats.prompt_tokens, model=model, kind="prompt")
+        tokens.inc(stats.completion_tokens, model=model, kind="completion")
+        cost.inc(stats.cost_usd, model=model)
+        latency.children[(model,)] = stats.latency
+
+    cache = suggestion_cache.stats()
+    cache_events = Counter("ai_cache_events_total", "Suggestion cache lookups and evictions.", ("event",))
+    for event in ("hits", "disk_hits", "misses", "coalesced", "evictions"):
+        cache_events.inc(cache[event], event=event)
+    cache_entries = Gauge("ai_cache_entries", "Entries in the in-memory suggestion cache.")
+    cache_entries.set(cache["entries"])
+    cache_bytes = Gauge("ai_cache_size_bytes", "Size of the in-memory suggestion cache.")
+    cache_bytes.set(cache["size_bytes"])
+
+    rules = rule_engine.stats()
+    rule_results = Counter("workflow_rules_evaluations_total", "Emails checked against local workflow rules.", ("result",))
+    rule_results.inc(rules["served_locally"], result="matched")
+    rule_results.inc(rules["evaluated"] - rules["served_locally"], result="unmatched")
+
+    compaction = compaction_stats.snapshot()
+    prompt_tokens = Counter("prompt_compaction_tokens_total", "Email prompt tokens before and after compaction.", ("stage",))
+    prompt_tokens.inc(compaction["tokens_before"], stage="before")
+    prompt_tokens.inc(compaction["tokens_after"], stage="after")
+
+    pipeline = metering.stats()
+    metering_events = Counter("metering_events_total", "Usage and action log events by outcome.", ("outcome",))
+    for outcome in ("enqueued", "flushed", "dropped"):
+        metering_events.inc(pipeline[outcome], outcome=outcome)
+    metering_queued = Gauge("metering_queue_depth", "Metering events waiting to be written.")
+    metering_queued.set(pipeline["queued"])
+
+    return [
+        in_flight, routed, requests, errors, hedged, hedge_wins, escalations, tokens, cost, latency,
+        cache_events, cache_entries, cache_bytes, rule_results, prompt_tokens, metering_events, metering_queued
+    ]
+
+metrics_registry.register_collector(collect_component_metrics)
+
+# --- AI Orchestration ---
+
+class AIResponseError(Exception):
+    """Raised when the AI's response does not contain a structured suggestion."""
+
+def classify_error(e: Exception) -> tuple[str, int, str]:
+    """Maps a failed suggestion to (error class, HTTP status, detail) and counts it."""
+    if isinstance(e, LLMSaturatedError):
+        classified = ("saturated", 429, str(e))
+    elif isinstance(e, openai.APITimeoutError):
+        classified = ("upstream_timeout", 504, "The AI provider did not respond in time.")
+    elif isinstance(e, openai.RateLimitError):
+        classified = ("upstream_rate_limited", 429, "The AI provider is rate limiting requests. Please retry shortly.")
+    elif isinstance(e, openai.APIConnectionError):
+        classified = ("upstream_connection", 502, "Could not connect to the AI provider.")
+    elif isinstance(e, openai.APIStatusError):
+        classified = ("upstream_status", 502, f"The AI provider returned HTTP {e.status_code}.")
+    elif isinstance(e, AIResponseError):
+        classified = ("invalid_response", 502, str(e))
+    elif isinstance(e, json.JSONDecodeError):
+        classified = ("invalid_json", 502, f"AI returned malformed JSON: {str(e)}")
+    elif isinstance(e, ValidationError):
+        classified = ("invalid_schema", 502, f"AI response failed validation with {e.error_count()} error(s).")
+    else:
+        classified = ("internal", 500, f"Internal Server Error: {str(e)}")
+    AI_ERRORS.inc(error_class=classified[0])
+    return classified
+
+def classified_http_error(e: Exception) -> HTTPException:
+    """Classifies a failure and converts it into the matching HTTPException."""
+    error_class, status_code, detail = classify_error(e)
+    print(f"An error occurred ({error_class}): {e}")
+    headers = {"Retry-After": "1"} if status_code == 429 else None
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+def route_email(context: EmailContext) -> Route:
+    """Chooses the model tier for one email."""
+    return router.route(context.body, context.thread_history, context.action_mode)
+
+def prepare_email(context: EmailContext, model: str) -> tuple[str, Optional[str]]:
+    """
+    Returns the body and thread history to send for one email. Call it once
+    per email; escalated requests reuse the result.
+    """
+    if not AI_PROMPT_COMPACTION_ENABLED:
+        return context.body, context.thread_history
+    # Strip quoted replies, signatures and HTML, and fit the model's token budget
+    with time_stage("compaction"):
+        compacted = compact_email(context.body, context.thread_history, model)
+    PROMPT_TOKENS.observe(compacted.tokens_before, stage="before")
+    PROMPT_TOKENS.observe(compacted.tokens_after, stage="after")
+    return compacted.body, compacted.thread_history
+
+def build_chat_request(
+    context: EmailContext,
+    system_prompt: str,
+    model: str,
+    body: str,
+    thread_history: Optional[str]
+) -> dict:
+    """Builds the chat completion arguments (model, messages, tool schema) for one prepared email."""
+    return {
+        "model": model,
+        "messages": prompt_builder.build_messages(
+            system_prompt,
+            context.subject,
+            context.sender,
+            body,
+            thread_history or "N/A"
+        ),
+        "tools": prompt_builder.tools,
+        "tool_choice": prompt_builder.tool_choice
+    }
+
+def parse_suggestion(function_args: str) -> AIActionSuggestion:
+    """Validates the tool-call JSON returned by the AI."""
+    with time_stage("json_parse"):
+        action_data = json.loads(function_args)
+    with time_stage("validation"):
+        return AIActionSuggestion(**action_data)
+
+async def request_suggestion(
+    context: EmailContext,
+    system_prompt: str,
+    model: str,
+    email: tuple[str, Optional[str]]
+) -> AIActionSuggestion:
+    """Calls the OpenAI API on one model and validates the structured action suggestion."""
+    with time_stage("prompt_build"):
+        request = build_chat_request(context, system_prompt, model, *email)
+    # Call the OpenAI API (non-blocking, bounded by the shared concurrency limit, hedged when slow)
+    with time_stage("upstream"):
+        response = await router.create_chat_completion(**request)
+    meter_tokens(context.user_id, response.usage, model)
     
-    **Output Requirement:** You MUST respond with a single JSON object that strictly adheres to the provided JSON schema. DO NOT include any other text, explanation, or markdown formatting outside of the JSON object.
+    # Extract the structured JSON from the response
+    tool_calls = response.choices[0].message.tool_calls
+    if not tool_calls:
+        raise AIResponseError("AI failed to return a structured JSON response.")
+        
+    return parse_suggestion(tool_calls[0].function.arguments)
+
+async def generate_suggestion(
+    context: EmailContext,
+    system_prompt: str,
+    route: Route,
+    email: tuple[str, Optional[str]]
+) -> AIActionSuggestion:
+    """Gets the suggestion from the routed model, re-running it on a stronger model if confidence is low."""
+    suggestion = await request_suggestion(context, system_prompt, route.model, email)
+    if router.should_escalate(route, suggestion.confidence):
+        logger.info(
+            "Escalating email for user %s from %s to %s (confidence %.2f)",
+            context.user_id, route.model, route.escalation_model, suggestion.confidence
+        )
+        suggestion = await request_suggestion(context, system_prompt, route.escalation_model, email)
+    return suggestion
+
+def meter_tokens(user_id: str, usage, model: str) -> None:
+    """Queues the upstream token usage of one OpenAI call for batched persistence."""
+    if usage is None:
+        return
+    metering.record(UsageEvent(
+        user_id=user_id,
+        source="ai",
+        model=model,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens
+    ))
+
+def meter_suggestion(context: EmailContext, suggestion: AIActionSuggestion, source: str) -> None:
+    """Queues the processed-email count and the suggested action log for one email."""
+    SUGGESTIONS.inc(source=source)
+    metering.record(UsageEvent(user_id=context.user_id, source=source, email_count=1))
+    metering.record(ActionLogEvent(
+        user_id=context.user_id,
+        suggested_action=suggestion.action,
+        confidence=suggestion.confidence,
+        status="pending_review"
+    ))
+
+def match_workflow_rule(context: EmailContext) -> Optional[AIActionSuggestion]:
+    """Returns the suggestion of a deterministic workflow rule matching this email, if any."""
+    rule = rule_engine.evaluate(context.user_id, context.subject, context.sender, context.body)
+    if not rule:
+        return None
+    return AIActionSuggestion(
+        action=rule.action,
+        confidence=1.0,
+        send_permission=rule.send_permission,
+        suggested_workflow_id=rule.workflow_id
+    )
+
+def suggestion_cache_key(context: EmailContext, system_prompt: str, model: str) -> str:
+    return make_cache_key(
+        model,
+        prompt_builder.version,
+        system_prompt,
+        context.subject,
+        context.sender,
+        context.body,
+        context.thread_history
+    )
+
+async def resolve_suggestion(context: EmailContext) -> AIActionSuggestion:
+    """
+    Produces the action suggestion for one email, deciding locally when a
+    workflow rule matches and serving repeats from the cache.
+    All failures are surfaced as HTTPException with a status matching their class.
+    """
+    try:
+        # 1. Deterministic workflow rules short-circuit the AI call
+        with time_stage("rule_match"):
+            suggestion = match_workflow_rule(context)
+        if suggestion:
+            meter_suggestion(context, suggestion, source="rule")
+            return suggestion
+
+        # 2. Construct the full prompt and pick the model
+        with time_stage("routing"):
+            system_prompt = get_system_prompt(context.user_id, context.workflow_rules)
+            route = route_email(context)
+
+        if not AI_CACHE_ENABLED:
+            suggestion = await generate_suggestion(context, system_prompt, route, prepare_email(context, route.model))
+            meter_suggestion(context, suggestion, source="ai")
+            return suggestion
+
+        # 3. Serve repeated emails from the cache; concurrent duplicates share one upstream call
+        cache_key = suggestion_cache_key(context, system_prompt, route.model)
+
+        async def compute() -> str:
+            # Only misses are compacted; cache hits never reach the prompt
+            suggestion = await generate_suggestion(context, system_prompt, route, prepare_email(context, route.model))
+            return suggestion.model_dump_json()
+
+        cached = await suggestion_cache.get_or_compute(cache_key, compute)
+        suggestion = AIActionSuggestion.model_validate_json(cached)
+        meter_suggestion(context, suggestion, source="ai")
+        return suggestion
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise classified_http_error(e)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_suggestion_events(context: EmailContext):
     """
-    return system_prompt
+    Yields SSE events for one email: a `field` event per decision field as soon
+    as it is decoded, `reply_delta` events while the reply is generated, then
+    `done` with the full suggestion (or `error`).
+    """
+    try:
+        with time_stage("rule_match"):
+            suggestion = match_workflow_rule(context)
+        system_prompt = cache_key = None
+        if suggestion is None:
+            with time_stage("routing"):
+                system_prompt = get_system_prompt(context.user_id, context.workflow_rules)
+                route = route_email(context)
+            if AI_CACHE_ENABLED:
+                cache_key = suggestion_cache_key(context, system_prompt, route.model)
+                cached = await suggestion_cache.lookup(cache_key)
+                if cached:
+                    suggestion = AIActionSuggestion.model_validate_json(cached)
+
+        # Rule matches and cache hits are replayed as if they had been streamed
+        if suggestion is not None:
+            meter_suggestion(context, suggestion, source="rule" if system_prompt is None else "ai")
+            for name in DECISION_FIELDS:
+                yield _sse("field", {name: getattr(suggestion, name)})
+            if suggestion.reply_text:
+                yield _sse("reply_delta", {"text": suggestion.reply_text})
+            yield _sse("done", suggestion.model_dump())
+            return
+
+        # Streamed answers are already on screen, so they are neither hedged nor escalated
+        parser = ToolArgumentsParser()
+        email = prepare_email(context, route.model)
+        with time_stage("prompt_build"):
+            request = build_chat_request(context, system_prompt, route.model, *email)
+        chunks = router.stream_chat_completion(**request, stream_options={"include_usage": True})
+        # Only time spent waiting on upstream counts, not the time the client takes to read each event
+        upstream_seconds = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = await anext(chunks, None)
+                upstream_seconds += time.perf_counter() - start
+                if chunk is None:
+                    break
+                if chunk.usage:
+                    meter_tokens(context.user_id, chunk.usage, route.model)
+                if not chunk.choices:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls or []:
+                    fragment = tool_call.function.arguments if tool_call.function else None
+                    if not fragment:
+                        continue
+                    reply_delta = ""
+                    for kind, name, value in parser.feed(fragment):
+                        if kind == "delta":
+                            reply_delta += value
+                        elif name in DECISION_FIELDS:
+                            yield _sse("field", {name: value})
+                    if reply_delta:
+                        yield _sse("reply_delta", {"text": reply_delta})
+        finally:
+            await chunks.aclose()
+
+        if not parser.buffer:
+            raise AIResponseError("AI failed to return a structured JSON response.")
+        STAGE_SECONDS.observe(upstream_seconds, stage="upstream")
+        suggestion = parse_suggestion(parser.buffer)
+        if cache_key:
+            await suggestion_cache.store(cache_key, suggestion.model_dump_json())
+        meter_suggestion(context, suggestion, source="ai")
+        yield _sse("done", suggestion.model_dump())
+
+    except Exception as e:
+        error_class, status_code, detail = classify_error(e)
+        print(f"An error occurred ({error_class}): {e}")
+        yield _sse("error", {"status_code": status_code, "detail": detail})
+
+@asynccontextmanager
+async def _user_batch_slot(user_id: str):
+    """Holds one of the user's concurrent batch item slots."""
+    if user_id not in _batch_user_limits:
+        _batch_user_limits[user_id] = asyncio.Semaphore(AI_BATCH_USER_CONCURRENCY)
+    limit = _batch_user_limits[user_id]
+    _batch_user_items[user_id] = _batch_user_items.get(user_id, 0) + 1
+    try:
+        async with limit:
+            yield
+    finally:
+        _batch_user_items[user_id] -= 1
+        if not _batch_user_items[user_id]:
+            del _batch_user_items[user_id]
+            del _batch_user_limits[user_id]
+
+def _validation_detail(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}" for error in e.errors())
+
+async def _resolve_batch_item(index: int, raw_context: Any) -> BatchItemResult:
+    """Validates and resolves one batch item, converting failures into a per-item error."""
+    try:
+        context = EmailContext.model_validate(raw_context)
+    except ValidationError as e:
+        return BatchItemResult(index=index, status_code=422, error=_validation_detail(e))
+    async with _user_batch_slot(context.user_id):
+        try:
+            return BatchItemResult(index=index, status_code=200, result=await resolve_suggestion(context))
+        except HTTPException as e:
+            return BatchItemResult(index=index, status_code=e.status_code, error=str(e.detail))
 
 # --- API Endpoints ---
 
 @app.get("/api/v1/user/status")
 async def get_user_status(user_id: str):
-    """Mocks retrieving user subscription and usage metrics."""
-    # In a real app, this would query the 'users' collection
+    """
+    Retrieves user subscription and usage metrics. Usage comes from the
+    per-user monthly aggregate maintained by the metering pipeline.
+    """
+    usage = await asyncio.to_thread(metering.store.monthly_usage, user_id, current_month())
+    # In a real app, the subscription would come from the 'users' collection
     return {
         "user_id": user_id,
         "subscription_status": "pro",
-        "email_count_monthly": 42,
+        "email_count_monthly": usage["email_count"],
+        "api_tokens_monthly": usage["prompt_tokens"] + usage["completion_tokens"],
         "limit_monthly": 1000,
         "is_active": True
     }
@@ -98,64 +611,137 @@ async def suggest_action(context: EmailContext):
     Core endpoint. Takes email context and returns a structured AI action suggestion.
     This simulates the secure, serverless call to the OpenAI API.
     """
+    observe_parse_stage()
+    return await resolve_suggestion(context)
+
+@app.post("/api/v1/ai/suggest-action/stream")
+async def suggest_action_stream(context: EmailContext):
+    """
+    Streaming variant of suggest-action over SSE. The action, confidence and
+    send permission arrive as soon as the AI has produced them, followed by
+    the reply text as it is generated.
+    """
+    observe_parse_stage()
+    return StreamingResponse(
+        stream_suggestion_events(context),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/ai/suggest-actions")
+async def suggest_actions(
+    contexts: list[Any],
+    stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format")
+):
+    """
+    Batch endpoint for whole-inbox triage. Items are processed concurrently
+    (capped per user) and streamed back in completion order, one result or
+    per-item error at a time. Each email is validated on its own, so a
+    malformed item gets a per-item 422 instead of failing the whole batch.
+    """
+    if len(contexts) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {AI_BATCH_MAX_ITEMS} emails.")
+
+    async def stream_results():
+        tasks = [asyncio.create_task(_resolve_batch_item(i, c)) for i, c in enumerate(contexts)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = (await next_done).model_dump_json()
+                yield f"data: {item}\n\n" if stream_format == "sse" else f"{item}\n"
+        finally:
+            # Stop outstanding work if the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream_results(), media_type=media_type)
+
+@app.post("/api/v1/ai/batches", response_model=BatchJobStatus)
+async def create_batch_job(contexts: list[EmailContext]):
+    """
+    Offline mode. Submits the emails as an OpenAI Batch API JSONL job
+    (cheaper, completes within 24h) and returns a batch ID to poll.
+    """
+    if len(contexts) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {AI_BATCH_MAX_ITEMS} emails.")
     try:
-        # 1. Construct the full prompt
-        system_prompt = get_system_prompt(context.user_id, context.workflow_rules)
-        
-        user_message = f"""
-        **Incoming Email Details:**
-        - Subject: {context.subject}
-        - Sender: {context.sender}
-        - Body:
-        ---
-        {context.body}
-        ---
-        
-        **Thread History (if available):**
-        ---
-        {context.thread_history or "N/A"}
-        ---
-        
-        Analyze the email and the user's rules, then generate the structured JSON action suggestion.
-        """
-        
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-        
-        # 2. Define the tool/function call for structured output
-        tool_schema: ChatCompletionToolParam = {
-            "type": "function",
-            "function": {
-                "name": "suggest_action",
-                "description": "Suggests an action and a draft reply for an incoming email based on user rules and context.",
-                "parameters": AIActionSuggestion.model_json_schema()
-            }
-        }
-
-        # 3. Call the OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", # Using a cost-effective model for this simulation
-            messages=messages,
-            tools=[tool_schema],
-            tool_choice={"type": "function", "function": {"name": "suggest_action"}}
+        requests = []
+        for i, c in enumerate(contexts):
+            model = route_email(c).model
+            system_prompt = get_system_prompt(c.user_id, c.workflow_rules)
+            requests.append((str(i), build_chat_request(c, system_prompt, model, *prepare_email(c, model))))
+        batch = await submit_batch(llm.client, build_batch_jsonl(requests), metadata={"source": "suggest-actions"})
+    except Exception as e:
+        raise classified_http_error(e)
+    return BatchJobStatus(batch_id=batch.id, status=batch.status, total=len(contexts))
+
+@app.get("/api/v1/ai/batches/{batch_id}", response_model=BatchJobStatus)
+async def get_batch_job(batch_id: str):
+    """Polls an offline batch job. Results are included once the job has completed."""
+    try:
+        batch = await llm.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        status = BatchJobStatus(
+            batch_id=batch.id,
+            status=batch.status,
+            total=counts.total if counts else 0,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0
         )
-        
-        # 4. Extract the structured JSON from the response
-        tool_calls = response.choices[0].message.tool_calls
-        if not tool_calls:
-            raise HTTPException(status_code=500, detail="AI failed to return a structured JSON response.")
-            
-        function_args = tool_calls[0].function.arguments
-        
-        # 5. Validate and return the Pydantic model
-        action_data = json.loads(function_args)
-        return AIActionSuggestion(**action_data)
+        if batch.status != "completed":
+            return status
 
+        results = []
+        for custom_id, outcome in (await fetch_batch_results(llm.client, batch)).items():
+            if "error" in outcome:
+                results.append(BatchItemResult(index=int(custom_id), status_code=502, error=outcome["error"]))
+                continue
+            try:
+                results.append(BatchItemResult(index=int(custom_id), status_code=200, result=parse_suggestion(outcome["arguments"])))
+            except Exception as e:
+                results.append(BatchItemResult(index=int(custom_id), status_code=500, error=f"Invalid AI response: {str(e)}"))
+        status.results = sorted(results, key=lambda r: r.index)
+        return status
+    except openai.NotFoundError:
+        raise HTTPException(status_code=404, detail=f"Batch job '{batch_id}' not found.")
     except Exception as e:
-        print(f"An error occurred: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        raise classified_http_error(e)
+
+@app.get("/api/v1/ai/prompt/stats")
+async def get_prompt_stats():
+    """Returns total prompt tokens before and after compaction."""
+    return compaction_stats.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition of request, stage and upstream latency
+    histograms, token and cost counters, error classes and in-flight gauges,
+    plus the counters behind the /stats endpoints.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = Query(5.0, gt=0, description="How long to sample the event loop.")):
+    """
+    Samples the event loop thread's call stacks for `seconds` and returns them
+    in collapsed-stack format (for flamegraph.pl or speedscope). Requires
+    PROFILER_ENABLED=true.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled.")
+    stacks = await asyncio.to_thread(sample_thread, threading.get_ident(), seconds)
+    return PlainTextResponse(collapsed(stacks))
+
+@app.get("/api/v1/ai/router/stats")
+async def get_router_stats():
+    """Returns per-model routing, escalation and hedging counters, latency percentiles and cost."""
+    return router.stats()
+
+@app.get("/api/v1/ai/cache/stats")
+async def get_cache_stats():
+    """Returns hit/miss/eviction counters for the AI suggestion cache."""
+    return {"enabled": AI_CACHE_ENABLED, **suggestion_cache.stats()}
 
 # Add other mock endpoints as defined in the design (accounts, workflows, etc.)
 @app.post("/api/v1/accounts/add")
@@ -164,14 +750,41 @@ async def add_account(user_id: str, provider: str):
     return {"status": "success", "message": f"OAuth flow initiated for user {user_id} with provider {provider}. Tokens would be stored securely."}
 
 @app.post("/api/v1/workflows/sync")
-async def sync_workflows(user_id: str, workflows: list):
-    """Mocks syncing user-defined workflows."""
-    return {"status": "success", "message": f"Synced {len(workflows)} workflows for user {user_id}."}
+async def sync_workflows(user_id: str, workflows: list[Workflow]):
+    """
+    Mocks syncing user-defined workflows. Rules that fully determine an action
+    are compiled so matching emails skip the AI entirely.
+    """
+    local_rules = rule_engine.sync(user_id, [w.model_dump() for w in workflows])
+    prompt_builder.invalidate(user_id)
+    return {
+        "status": "success",
+        "message": f"Synced {len(workflows)} workflows for user {user_id}.",
+        "local_rules": local_rules
+    }
+
+@app.get("/api/v1/workflows/stats")
+async def get_workflow_stats():
+    """Returns how many emails were decided by local workflow rules instead of the AI."""
+    return rule_engine.stats()
 
 @app.post("/api/v1/actions/log")
-async def log_action(action_log: dict):
-    """Mocks logging a completed or suggested action."""
-    return {"status": "success", "message": "Action logged successfully."}
+async def log_action(action_log: ActionLog):
+    """Queues a completed or suggested action for batched persistence."""
+    event = ActionLogEvent(**action_log.model_dump())
+    metering.record(event)
+    return {"status": "success", "message": "Action logged successfully.", "action_log_id": event.action_log_id}
+
+@app.post("/api/v1/billing/usage")
+async def log_usage(usage: UsageReport):
+    """Queues usage for metering (suggest-action records its own usage internally)."""
+    metering.record(UsageEvent(source="client", **usage.model_dump()))
+    return {"status": "success", "message": "Usage logged successfully."}
+
+@app.get("/api/v1/billing/stats")
+async def get_metering_stats():
+    """Returns queue and flush counters of the metering pipeline."""
+    return metering.stats()
 
 # Root endpoint for health check
 @app.get("/")
@@ -0,0 +1,248 @@
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+# --- Configuration ---
+# Local SQLite store standing in for the 'users.usage_metrics' and 'actions' collections
+METERING_DB_PATH = os.getenv("METERING_DB_PATH", "metering.db")
+METERING_QUEUE_SIZE = int(os.getenv("METERING_QUEUE_SIZE", "10000"))
+METERING_BATCH_SIZE = int(os.getenv("METERING_BATCH_SIZE", "500"))
+METERING_FLUSH_INTERVAL_SECONDS = float(os.getenv("METERING_FLUSH_INTERVAL_SECONDS", "1.0"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    model TEXT,
+    source TEXT NOT NULL,
+    email_count INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage_monthly (
+    user_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    email_count INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month)
+);
+CREATE TABLE IF NOT EXISTS actions (
+    action_log_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    account_id TEXT,
+    source_type TEXT NOT NULL,
+    source_id TEXT,
+    suggested_action TEXT NOT NULL,
+    confidence REAL,
+    status TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+"""
+
+
+# Queued by stop() to tell the background task to finish
+_STOP = object()
+
+
+def current_month(timestamp: Optional[float] = None) -> str:
+    """Billing period key, e.g. '2025-11'."""
+    moment = datetime.fromtimestamp(timestamp or time.time(), tz=timezone.utc)
+    return moment.strftime("%Y-%m")
+
+
+@dataclass
+class UsageEvent:
+    user_id: str
+    source: str  # 'ai', 'rule' or 'client'
+    email_count: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class ActionLogEvent:
+    user_id: str
+    suggested_action: str
+    status: str  # 'pending_review', 'sent', 'drafted', 'rejected'
+    confidence: Optional[float] = None
+    account_id: Optional[str] = None
+    source_type: str = "email"
+    source_id: Optional[str] = None
+    action_log_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    timestamp: float = field(default_factory=time.time)
+
+
+class MeteringStore:
+    """SQLite (WAL mode) store for usage events, monthly aggregates and action logs."""
+
+    def __init__(self, path: str = METERING_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def write_batch(self, events: list[Union[UsageEvent, ActionLogEvent]]) -> None:
+        """Writes a batch in one transaction and folds usage into the monthly aggregate."""
+        usage = [e for e in events if isinstance(e, UsageEvent)]
+        actions = [e for e in events if isinstance(e, ActionLogEvent)]
+
+        # Pre-aggregate so each (user, month) row is updated once per batch
+        totals: dict[tuple[str, str], list[int]] = {}
+        for e in usage:
+            row = totals.setdefault((e.user_id, current_month(e.timestamp)), [0, 0, 0])
+            row[0] += e.email_count
+            row[1] += e.prompt_tokens
+            row[2] += e.completion_tokens
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO usage_events (user_id, month, model, source, email_count, prompt_tokens, completion_tokens, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (e.user_id, current_month(e.timestamp), e.model, e.source,
+                     e.email_count, e.prompt_tokens, e.completion_tokens, e.timestamp)
+                    for e in usage
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO usage_monthly (user_id, month, email_count, prompt_tokens, completion_tokens) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, month) DO UPDATE SET "
+                "email_count = email_count + excluded.email_count, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens",
+                [(user_id, month, *row) for (user_id, month), row in totals.items()],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO actions (action_log_id, user_id, account_id, source_type, source_id, "
+                "suggested_action, confidence, status, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (e.action_log_id, e.user_id, e.account_id, e.source_type, e.source_id,
+                     e.suggested_action, e.confidence, e.status, e.timestamp)
+                    for e in actions
+                ],
+            )
+
+    def monthly_usage(self, user_id: str, month: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT email_count, prompt_tokens, completion_tokens FROM usage_monthly WHERE user_id = ? AND month = ?",
+                (user_id, month),
+            ).fetchone()
+        email_count, prompt_tokens, completion_tokens = row or (0, 0, 0)
+        return {"email_count": email_count, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MeteringPipeline:
+    """
+    Bounded in-process queue drained by a background task that writes events
+    in batches. Recording never blocks the request path: when the queue is
+    full the event is dropped and counted instead.
+    """
+
+    def __init__(
+        self,
+        store: MeteringStore,
+        queue_size: int = METERING_QUEUE_SIZE,
+        batch_size: int = METERING_BATCH_SIZE,
+        flush_interval: float = METERING_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    def record(self, event: Union[UsageEvent, ActionLogEvent]) -> None:
+        """Enqueues an event without blocking. Must be called from the event loop."""
+        if self._stopping:
+            self.dropped += 1
+            return
+        if self._task is None:
+            # Started lazily when the app runs without lifespan events
+            self.start()
+        try:
+            self._queue.put_nowait(event)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def stop(self) -> None:
+        """Flushes everything already queued, then stops the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        # The sentinel is queued behind every pending event, so they are all written first
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            event = await self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    # asyncio.timeout, unlike wait_for, never swallows a concurrent cancellation
+                    async with asyncio.timeout(timeout):
+                        event = await self._queue.get()
+                except TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            except Exception as e:
+                print(f"An error occurred while flushing metering events: {e}")
+
+    async def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        await asyncio.to_thread(self.store.write_batch, batch)
+        self.flushed += len(batch)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
@@ -0,0 +1,235 @@
+import time
+import bisect
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional, Sequence
+
+# Upper bounds in seconds, spanning cached/local answers up to slow upstream calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# perf_counter() at which the current HTTP request entered the app, set by MetricsMiddleware
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds (Prometheus semantics)."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is the +Inf bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the q-quantile by linear interpolation within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Returns (upper bound, cumulative count) pairs, ending with +Inf."""
+        pairs, total = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            total += bucket_count
+            pairs.append((bound, total))
+        return pairs
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Counter:
+    """Monotonic value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        for key, value in self.values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    """Value per label combination that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class HistogramFamily:
+    """A Histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.children: dict[tuple, Histogram] = {}
+
+    def labels(self, **labels) -> Histogram:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        if key not in self.children:
+            self.children[key] = Histogram(self.buckets)
+        return self.children[key]
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        for key, histogram in self.children.items():
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in histogram.cumulative():
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count
+            yield f"{self.name}_sum", labels, histogram.sum
+            yield f"{self.name}_count", labels, histogram.count
+
+
+class StageTimer:
+    """Context manager that observes the wall time of one request stage."""
+
+    def __init__(self, family: HistogramFamily, stage: str):
+        self.family = family
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.family.observe(time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class Registry:
+    """
+    Holds metrics and renders them in the Prometheus text exposition format.
+    Collectors are called at scrape time and return freshly built metrics, so
+    components that keep their own counters need no changes to be exported.
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable]] = []
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> HistogramFamily:
+        return self._add(HistogramFamily(name, description, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable]) -> None:
+        self._collectors.append(collector)
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        collected = [metric for collector in self._collectors for metric in collector()]
+        for metric in self._metrics + collected:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, durations (until the last body
+    byte is sent, so streamed responses are measured in full) and in-flight
+    requests, labelled by route template rather than raw path.
+    """
+
+    def __init__(self, app, registry: Registry):
+        self.app = app
+        self.requests = registry.counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+        self.duration = registry.histogram("http_request_duration_seconds", "HTTP request duration.", ("method", "route"))
+        self.in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = request_started.set(start)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            request_started.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so arbitrary URLs cannot grow the series count
+            template = getattr(route, "path", "unmatched")
+            self.requests.inc(method=scope["method"], route=template, status=status)
+            self.duration.observe(time.perf_counter() - start, method=scope["method"], route=template)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from llm_client import LLMClient
+from metrics import Histogram
+from prompt_compaction import count_quoted_messages, get_tokenizer
+
+# --- Configuration ---
+AI_ROUTER_ENABLED = os.getenv("AI_ROUTER_ENABLED", "true").lower() == "true"
+# Stronger (more expensive) model for hard emails and low-confidence retries
+AI_MODEL_STRONG = os.getenv("AI_MODEL_STRONG", "gpt-4o")
+AI_ROUTER_LONG_EMAIL_TOKENS = int(os.getenv("AI_ROUTER_LONG_EMAIL_TOKENS", "1500"))
+AI_ROUTER_DEEP_THREAD_MESSAGES = int(os.getenv("AI_ROUTER_DEEP_THREAD_MESSAGES", "4"))
+AI_ESCALATION_CONFIDENCE = float(os.getenv("AI_ESCALATION_CONFIDENCE", "0.6"))
+# Secondary endpoint for hedged requests; hedging is off unless it is set
+AI_HEDGE_API_BASE = os.getenv("AI_HEDGE_API_BASE")
+AI_HEDGE_API_KEY = os.getenv("AI_HEDGE_API_KEY")
+AI_HEDGE_QUANTILE = float(os.getenv("AI_HEDGE_QUANTILE", "0.95"))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+# Hedge delay used until a model has AI_HEDGE_MIN_SAMPLES latency samples
+AI_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("AI_HEDGE_DEFAULT_DELAY_SECONDS", "5"))
+LATENCY_WINDOW = 500
+
+# USD per 1M (input, output) tokens, for the cost counters
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+
+@dataclass
+class Route:
+    model: str
+    reason: str  # 'default', 'auto_send', 'deep_thread' or 'long_email'
+    escalation_model: Optional[str] = None  # Re-run here if the confidence is too low
+
+
+class ModelStats:
+    """Latency histogram, request counters and token/cost totals of one model."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        # Recent primary-endpoint latencies, used for the hedging budget
+        self.recent: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.routed = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.escalations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "routed": self.routed,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "escalations": self.escalations,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+def thread_depth(body: str, thread_history: Optional[str]) -> int:
+    """Estimates the number of messages in the thread, including this one."""
+    # A history without reply headers is a summary of at least one earlier message
+    earlier = count_quoted_messages(thread_history) or (1 if thread_history else 0)
+    return 1 + max(count_quoted_messages(body), earlier)
+
+
+async def _first_result(tasks: set[asyncio.Task]) -> tuple:
+    """Returns (result, task) of the first task to succeed; raises the first failure if all fail."""
+    pending, first_error = set(tasks), None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result(), task
+            first_error = first_error or task.exception()
+    raise first_error
+
+
+class ModelRouter:
+    """
+    Picks a model per email and runs its chat completions.
+
+    Emails are routed to the fast model unless their features (auto-sent
+    replies, deep threads, long bodies) call for the strong one, and fast
+    answers below the confidence threshold are re-run on the strong model.
+    A call that outlives its model's recent p95 latency (or fails before then)
+    is duplicated to the secondary endpoint and the first success is used.
+    """
+
+    def __init__(
+        self,
+        primary: LLMClient,
+        secondary: Optional[LLMClient],
+        fast_model: str,
+        strong_model: str = AI_MODEL_STRONG,
+        enabled: bool = AI_ROUTER_ENABLED,
+        escalation_confidence: float = AI_ESCALATION_CONFIDENCE,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.enabled = enabled
+        self.escalation_confidence = escalation_confidence
+        self._stats: dict[str, ModelStats] = {}
+
+    def stats_for(self, model: str) -> ModelStats:
+        if model not in self._stats:
+            self._stats[model] = ModelStats()
+        return self._stats[model]
+
+    def model_stats(self) -> dict[str, ModelStats]:
+        return dict(self._stats)
+
+    def route(self, body: str, thread_history: Optional[str], action_mode: Optional[str] = None) -> Route:
+        """Chooses the model tier for one email from its features."""
+        if not self.enabled or self.strong_model == self.fast_model:
+            route = Route(self.fast_model, "default")
+        elif action_mode == "auto_send":
+            # Replies go out unreviewed, so spend more on getting them right
+            route = Route(self.strong_model, "auto_send")
+        elif thread_depth(body, thread_history) >= AI_ROUTER_DEEP_THREAD_MESSAGES:
+            route = Route(self.strong_model, "deep_thread")
+        elif get_tokenizer(self.fast_model).count(body) > AI_ROUTER_LONG_EMAIL_TOKENS:
+            route = Route(self.strong_model, "long_email")
+        else:
+            route = Route(self.fast_model, "default", escalation_model=self.strong_model)
+        self.stats_for(route.model).routed += 1
+        return route
+
+    def should_escalate(self, route: Route, confidence: float) -> bool:
+        """True if the answer should be re-run on the route's escalation model."""
+        if route.escalation_model is None or confidence >= self.escalation_confidence:
+            return False
+        self.stats_for(route.model).escalations += 1
+        return True
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait for the primary before hedging, or None if hedging is off."""
+        if self.secondary is None:
+            return None
+        recent = self.stats_for(model).recent
+        if len(recent) < AI_HEDGE_MIN_SAMPLES:
+            return AI_HEDGE_DEFAULT_DELAY_SECONDS
+        return sorted(recent)[int(AI_HEDGE_QUANTILE * (len(recent) - 1))]
+
+    def record(self, model: str, latency: float, usage) -> None:
+        """Adds one completed call to the model's latency histogram and cost counters."""
+        stats = self.stats_for(model)
+        stats.latency.observe(latency)
+        if usage is None:
+            return
+        stats.prompt_tokens += usage.prompt_tokens
+        stats.completion_tokens += usage.completion_tokens
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        stats.cost_usd += (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1_000_000
+
+    async def create_chat_completion(self, model: str, **kwargs):
+        """Runs a chat completion on `model`, hedged to the secondary endpoint when the primary is slow."""
+        stats = self.stats_for(model)
+        stats.requests += 1
+        start = time.perf_counter()
+        primary = asyncio.create_task(self.primary.create_chat_completion(model=model, **kwargs))
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay(model)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done or primary.exception() is not None:
+                    stats.hedged += 1
+                    tasks.add(asyncio.create_task(self.secondary.create_chat_completion(model=model, **kwargs)))
+            response, winner = await _first_result(tasks)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        latency = time.perf_counter() - start
+        # When the hedge wins, the primary's latency is only known to be at least this long
+        stats.recent.append(latency)
+        if winner is not primary:
+            stats.hedge_wins += 1
+        self.record(model, latency, response.usage)
+        return response
+
+    async def stream_chat_completion(self, model: str, **kwargs):
+        """
+        Streams a chat completion on `model` from the primary endpoint (streams
+        are not hedged). The recorded latency is the time spent waiting on
+        upstream chunks, excluding the time the consumer holds each chunk.
+        """
+        stats = self.stats_for(model)
+        stats.requests += 1
+        stream = self.primary.stream_chat_completion(model=model, **kwargs)
+        latency, usage = 0.0, None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = await anext(stream)
+                except StopAsyncIteration:
+                    break
+                latency += time.perf_counter() - start
+                usage = chunk.usage or usage
+                yield chunk
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            await stream.aclose()
+        self.record(model, latency, usage)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hedging": self.secondary is not None,
+            "models": {model: stats.snapshot() for model, stats in self._stats.items()},
+        }
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+from collections import Counter
+
+# --- Configuration ---
+# The profile endpoint exposes code paths, so it is off unless explicitly enabled
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.005"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "30"))
+
+
+def _stack_of(frame) -> str:
+    """Formats a frame's call stack root-first as 'file:function;file:function'."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_thread(thread_id: int, seconds: float, interval: float = PROFILER_INTERVAL_SECONDS) -> Counter:
+    """
+    Samples the call stack of another thread (normally the event loop's) at a
+    fixed interval and counts identical stacks. Must run in a separate thread;
+    the sampled thread keeps running and only pays for the frame walk.
+    """
+    stacks = Counter()
+    deadline = time.monotonic() + min(seconds, PROFILER_MAX_SECONDS)
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[_stack_of(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    """Renders stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,111 @@
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Callable
+
+TOOL_NAME = "suggest_action"
+TOOL_DESCRIPTION = "Suggests an action and a draft reply for an incoming email based on user rules and context."
+
+# Identical for every user and request, so it forms a cacheable prompt prefix
+# together with the tool schema. Per-user text must never be added here.
+# Together they are only about 400 tokens, below OpenAI's 1024-token minimum
+# for prompt caching, so the prefix is not cached until it grows past that.
+STATIC_SYSTEM_PROMPT = """You are an expert AI Email Automation Agent. Your task is to analyze an incoming email and suggest the best action, including a draft reply if necessary.
+
+**Output Requirement:** You MUST respond with a single JSON object that strictly adheres to the provided JSON schema. DO NOT include any other text, explanation, or markdown formatting outside of the JSON object."""
+
+USER_PROMPT_TEMPLATE = """**User Persona:** {persona}
+
+**Workflow Rules:** The user has provided the following specific rules for this email: "{workflow_rules}". You must adhere to these rules."""
+
+EMAIL_MESSAGE_TEMPLATE = """**Incoming Email Details:**
+- Subject: {subject}
+- Sender: {sender}
+- Body:
+---
+{body}
+---
+
+**Thread History (if available):**
+---
+{thread_history}
+---
+
+Analyze the email and the user's rules, then generate the structured JSON action suggestion."""
+
+
+class PromptBuilder:
+    """
+    Assembles chat requests from precomputed parts. The tool schema and static
+    system prompt are built once; per-user prompts are memoized until the
+    user's workflows are synced again.
+
+    Messages are ordered static-first (tools, static system prompt, per-user
+    system prompt, email) so the longest possible prefix is byte-identical
+    across users and eligible for provider-side prompt caching.
+    """
+
+    def __init__(
+        self,
+        parameters_schema: dict,
+        persona_loader: Callable[[str], str],
+        max_prompts_per_user: int = 32,
+        max_users: int = 10000,
+    ):
+        self.tools = [{
+            "type": "function",
+            "function": {
+                "name": TOOL_NAME,
+                "description": TOOL_DESCRIPTION,
+                "parameters": parameters_schema,
+            },
+        }]
+        self.tool_choice = {"type": "function", "function": {"name": TOOL_NAME}}
+        self.static_message = {"role": "system", "content": STATIC_SYSTEM_PROMPT}
+        # Changes whenever the static prefix changes, e.g. to version cache keys
+        self.version = hashlib.sha256(
+            (STATIC_SYSTEM_PROMPT + json.dumps(self.tools, sort_keys=True)).encode("utf-8")
+        ).hexdigest()[:16]
+        self._persona_loader = persona_loader
+        self._max_prompts_per_user = max_prompts_per_user
+        self._max_users = max_users
+        # Least recently used users are evicted first
+        self._user_prompts: OrderedDict[str, OrderedDict[str, str]] = OrderedDict()
+
+    def user_prompt(self, user_id: str, workflow_rules: str) -> str:
+        """Returns the memoized per-user system prompt (persona plus workflow rules)."""
+        prompts = self._user_prompts.get(user_id)
+        if prompts is None:
+            prompts = self._user_prompts[user_id] = OrderedDict()
+            if len(self._user_prompts) > self._max_users:
+                self._user_prompts.popitem(last=False)
+        else:
+            self._user_prompts.move_to_end(user_id)
+        prompt = prompts.get(workflow_rules)
+        if prompt is not None:
+            prompts.move_to_end(workflow_rules)
+            return prompt
+        prompt = USER_PROMPT_TEMPLATE.format(
+            persona=self._persona_loader(user_id),
+            workflow_rules=workflow_rules,
+        )
+        prompts[workflow_rules] = prompt
+        if len(prompts) > self._max_prompts_per_user:
+            prompts.popitem(last=False)
+        return prompt
+
+    def invalidate(self, user_id: str) -> None:
+        """Drops the user's memoized prompts (called when workflows are synced)."""
+        self._user_prompts.pop(user_id, None)
+
+    def build_messages(self, user_prompt: str, subject: str, sender: str, body: str, thread_history: str) -> list[dict]:
+        return [
+            self.static_message,
+            {"role": "system", "content": user_prompt},
+            {"role": "user", "content": EMAIL_MESSAGE_TEMPLATE.format(
+                subject=subject,
+                sender=sender,
+                body=body,
+                thread_history=thread_history,
+            )},
+        ]
@@ -0,0 +1,245 @@
+import os
+import re
+import html
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+# --- Configuration ---
+AI_PROMPT_COMPACTION_ENABLED = os.getenv("AI_PROMPT_COMPACTION_ENABLED", "true").lower() == "true"
+# Token budget for the email body plus thread history, per model
+MODEL_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 4000,
+    "gpt-4o": 6000,
+    "gpt-4.1-mini": 4000,
+    "gpt-4.1": 6000,
+}
+DEFAULT_TOKEN_BUDGET = 4000
+# Overrides the budget for every model when set
+AI_PROMPT_TOKEN_BUDGET = os.getenv("AI_PROMPT_TOKEN_BUDGET")
+# Share of the budget reserved for the body when both body and history are long
+BODY_BUDGET_SHARE = 0.7
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = "\n[... truncated ...]"
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_HTML_DROP = re.compile(r"<(script|style|head|title)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_BREAK = re.compile(r"<\s*(br|/p|/div|/tr|/li|/h[1-6])\b[^>]*>", re.IGNORECASE)
+_HTML_DETECT = re.compile(r"<\s*(html|body|div|p|br|table|span|a)\b", re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_SPACES = re.compile(r"[ \t\xa0]+")
+
+# Each marker family is one alternation, so a body line costs one match per family
+
+# A line that starts a quoted reply chain; everything from here on is dropped
+_REPLY_HEADER = re.compile(r"^\s*(On .{0,200}wrote:|-{2,}\s*Original Message\s*-{2,})\s*$", re.IGNORECASE)
+# A line that starts a forwarded (or Outlook-style) message header; only the
+# header lines are dropped, since the message below is often the email's content
+_FORWARD_HEADER = re.compile(r"^\s*(-{2,}\s*Forwarded message\s*-{2,}\s*|From:\s.*[@<].*|_{10,}\s*)$", re.IGNORECASE)
+_FORWARD_FIELD = re.compile(r"^\s*(From|Sent|Date|To|Cc|Subject|Reply-To):\s", re.IGNORECASE)
+# A header that introduces one earlier message (the underscore rule only separates them)
+_MESSAGE_HEADER = re.compile(
+    r"^\s*(On .{0,200}wrote:\s*|-{2,}\s*(Original Message|Forwarded message)\s*-{2,}\s*|From:\s.*[@<].*)$",
+    re.IGNORECASE,
+)
+# A line that starts a signature block
+_SIGNATURE_MARKER = re.compile(
+    r"^(--\s*"
+    r"|\s*Sent from my (iPhone|iPad|Android|mobile device|Galaxy).*"
+    r"|\s*Get Outlook for (iOS|Android).*"
+    r"|\s*(CONFIDENTIALITY NOTICE|DISCLAIMER)\b.*)$",
+    re.IGNORECASE,
+)
+
+class Tokenizer:
+    """Counts and truncates tokens with tiktoken when available, else estimates from characters."""
+
+    def __init__(self, model: Optional[str]):
+        self._encoding = None
+        if tiktoken is not None and model is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception:
+                try:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    # Encoding files unavailable (e.g., offline); use the estimate
+                    self._encoding = None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """Cuts `text` to `max_tokens`, keeping the start (or the end for `keep_end`)."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            kept = tokens[-max_tokens:] if keep_end else tokens[:max_tokens]
+            return self._encoding.decode(kept)
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        return text[-max_chars:] if keep_end else text[:max_chars]
+
+
+_tokenizers: dict[str, Tokenizer] = {}
+_CHARACTER_ESTIMATE = Tokenizer(None)
+
+
+def load_tokenizer(model: str) -> Tokenizer:
+    """
+    Loads the model's tokenizer. tiktoken downloads encoding files on first
+    use, so call this off the event loop (the app loads its models at startup).
+    """
+    if model not in _tokenizers:
+        _tokenizers[model] = Tokenizer(model)
+    return _tokenizers[model]
+
+
+def get_tokenizer(model: str) -> Tokenizer:
+    """Returns the model's tokenizer if it has been loaded, else the character estimate."""
+    return _tokenizers.get(model, _CHARACTER_ESTIMATE)
+
+
+def token_budget(model: str) -> int:
+    if AI_PROMPT_TOKEN_BUDGET:
+        return int(AI_PROMPT_TOKEN_BUDGET)
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+class CompactionStats:
+    """Running totals of prompt tokens before and after compaction."""
+
+    def __init__(self):
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, tokens_before: int, tokens_after: int) -> None:
+        self.requests += 1
+        self.tokens_before += tokens_before
+        self.tokens_after += tokens_after
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": AI_PROMPT_COMPACTION_ENABLED,
+            "requests": self.requests,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "reduction": 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0,
+        }
+
+
+compaction_stats = CompactionStats()
+
+
+@dataclass
+class CompactedEmail:
+    body: str
+    thread_history: Optional[str]
+    tokens_before: int
+    tokens_after: int
+
+
+def html_to_text(text: str) -> str:
+    """Reduces HTML email markup to plain text; non-HTML input is returned unchanged."""
+    if not _HTML_DETECT.search(text):
+        return text
+    text = _HTML_DROP.sub("", text)
+    text = _HTML_BREAK.sub("\n", text)
+    text = _HTML_TAG.sub("", text)
+    return html.unescape(text)
+
+
+def strip_quoted_and_signature(text: str) -> str:
+    """
+    Drops quoted reply chains ('>' lines, 'On ... wrote:' blocks) and
+    signatures. Forwarded messages keep their body; only their headers go.
+    """
+    kept = []
+    in_forward_headers = in_signature = False
+    for line in text.splitlines():
+        if _REPLY_HEADER.match(line):
+            # Keep cutting only once some content has been seen (a reply can start with a header)
+            if any(k.strip() for k in kept):
+                break
+            continue
+        if _FORWARD_HEADER.match(line):
+            in_forward_headers, in_signature = True, False
+            continue
+        if in_forward_headers and _FORWARD_FIELD.match(line):
+            continue
+        in_forward_headers = False
+        if _SIGNATURE_MARKER.match(line):
+            # A signature runs until the next forwarded message, if any
+            in_signature = True
+            continue
+        if in_signature or line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def count_quoted_messages(text: Optional[str]) -> int:
+    """Counts the earlier messages quoted in an email body or thread history."""
+    if not text:
+        return 0
+    return sum(1 for line in text.splitlines() if _MESSAGE_HEADER.match(line))
+
+
+def _normalize_whitespace(text: str) -> str:
+    lines = [_SPACES.sub(" ", line).strip() for line in text.splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def dedupe_against_history(body: str, thread_history: Optional[str]) -> str:
+    """Removes body paragraphs that already appear verbatim in the thread history."""
+    if not thread_history:
+        return body
+    history = _SPACES.sub(" ", thread_history.replace("\n", " ")).lower()
+    paragraphs = body.split("\n\n")
+    kept = [p for p in paragraphs if len(p) < 40 or _SPACES.sub(" ", p.replace("\n", " ")).lower() not in history]
+    return "\n\n".join(kept)
+
+
+def compact_email(body: str, thread_history: Optional[str], model: str) -> CompactedEmail:
+    """
+    Cleans the email body and thread history and fits them into the model's
+    token budget. Recent history is kept in preference to older history.
+    """
+    tokenizer = get_tokenizer(model)
+    tokens_before = tokenizer.count(body) + (tokenizer.count(thread_history) if thread_history else 0)
+
+    clean_history = _normalize_whitespace(html_to_text(thread_history)) if thread_history else None
+    clean_body = _normalize_whitespace(strip_quoted_and_signature(html_to_text(body)))
+    clean_body = dedupe_against_history(clean_body, clean_history)
+    if not clean_body:
+        # Never send an empty body; fall back to the plain text of the original
+        clean_body = _normalize_whitespace(html_to_text(body))
+
+    budget = token_budget(model)
+    body_tokens = tokenizer.count(clean_body)
+    history_tokens = tokenizer.count(clean_history) if clean_history else 0
+    if body_tokens + history_tokens > budget:
+        body_limit = max(budget - history_tokens, int(budget * BODY_BUDGET_SHARE))
+        if body_tokens > body_limit:
+            clean_body = tokenizer.truncate(clean_body, body_limit) + TRUNCATION_MARKER
+            body_tokens = tokenizer.count(clean_body)
+        if clean_history and history_tokens > budget - body_tokens:
+            clean_history = TRUNCATION_MARKER.strip() + "\n" + tokenizer.truncate(
+                clean_history, budget - body_tokens, keep_end=True
+            )
+
+    tokens_after = tokenizer.count(clean_body) + (tokenizer.count(clean_history) if clean_history else 0)
+    compaction_stats.record(tokens_before, tokens_after)
+    return CompactedEmail(clean_body, clean_history, tokens_before, tokens_after)
@@ -0,0 +1,191 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Actions a workflow can fully determine without generating text.
+# 'draft_reply' and 'schedule_meeting' still need the AI to write content.
+LOCAL_ACTIONS = {"archive", "flag_for_review"}
+
+# Maps a workflow's action_mode onto the send_permission of the suggestion
+SEND_PERMISSIONS = {"auto_send": "auto_send", "draft_only": "draft_only"}
+# Actions whose whole point is that the user looks first, whatever the action_mode
+REVIEW_ONLY_ACTIONS = {"flag_for_review"}
+
+SUPPORTED_CONDITIONS = ("if_sender", "if_subject_contains", "if_body_contains")
+
+
+class AhoCorasick:
+    """Case-insensitive multi-keyword matcher; one pass over the text finds every keyword."""
+
+    def __init__(self, keywords: dict[str, list[int]]):
+        # keywords: lowercase keyword -> rule ids that require it
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        for keyword, rule_ids in keywords.items():
+            node = 0
+            for char in keyword:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].extend(rule_ids)
+
+        # Breadth-first pass to build failure links; depth-1 nodes fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, text: str) -> set[int]:
+        """Returns the rule ids whose keyword occurs anywhere in `text`."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[int] = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+@dataclass
+class CompiledRule:
+    workflow_id: str
+    action: str
+    send_permission: str
+    condition_count: int
+
+
+@dataclass
+class CompiledRuleSet:
+    """All locally decidable rules for one user, indexed for constant-time sender lookups."""
+    rules: list[CompiledRule] = field(default_factory=list)
+    by_domain: dict[str, list[int]] = field(default_factory=dict)
+    by_address: dict[str, list[int]] = field(default_factory=dict)
+    by_local_part: dict[str, list[int]] = field(default_factory=dict)
+    subject_matcher: Optional[AhoCorasick] = None
+    body_matcher: Optional[AhoCorasick] = None
+    body_rule_ids: set[int] = field(default_factory=set)
+
+
+def compile_workflows(workflows: list[dict]) -> CompiledRuleSet:
+    """
+    Compiles synced workflows into indexes. Each map in a workflow's `rules`
+    is one alternative (any may trigger); conditions inside a map must all hold.
+    """
+    compiled = CompiledRuleSet()
+    subject_keywords: dict[str, list[int]] = {}
+    body_keywords: dict[str, list[int]] = {}
+
+    for workflow in workflows:
+        action = workflow.get("action")
+        if action not in LOCAL_ACTIONS or workflow.get("target_type", "email") != "email":
+            continue
+        if action in REVIEW_ONLY_ACTIONS:
+            send_permission = "needs_review"
+        else:
+            send_permission = SEND_PERMISSIONS.get(workflow.get("action_mode"), "needs_review")
+        for rule in workflow.get("rules") or []:
+            # Strip before dropping empty values, so a blank keyword cannot match every email
+            conditions = {k: str(v).strip().lower() for k, v in rule.items() if v}
+            conditions = {k: v for k, v in conditions.items() if v}
+            # Rules with conditions we cannot evaluate locally are left to the AI
+            if not conditions or any(k not in SUPPORTED_CONDITIONS for k in conditions):
+                continue
+            rule_id = len(compiled.rules)
+            compiled.rules.append(
+                CompiledRule(str(workflow.get("workflow_id")), action, send_permission, len(conditions))
+            )
+            sender = conditions.get("if_sender")
+            if sender:
+                if sender.endswith("@"):
+                    compiled.by_local_part.setdefault(sender[:-1], []).append(rule_id)
+                # A leading '@' marks a domain rule ('@domain.com'), not an address
+                elif "@" in sender.lstrip("@"):
+                    compiled.by_address.setdefault(sender, []).append(rule_id)
+                else:
+                    compiled.by_domain.setdefault(sender.lstrip("@."), []).append(rule_id)
+            if "if_subject_contains" in conditions:
+                subject_keywords.setdefault(conditions["if_subject_contains"], []).append(rule_id)
+            if "if_body_contains" in conditions:
+                body_keywords.setdefault(conditions["if_body_contains"], []).append(rule_id)
+                compiled.body_rule_ids.add(rule_id)
+
+    if subject_keywords:
+        compiled.subject_matcher = AhoCorasick(subject_keywords)
+    if body_keywords:
+        compiled.body_matcher = AhoCorasick(body_keywords)
+    return compiled
+
+
+class RuleEngine:
+    """Per-user compiled workflow rules that can decide an email's action without the AI."""
+
+    def __init__(self):
+        self._rule_sets: dict[str, CompiledRuleSet] = {}
+        self.evaluated = 0
+        self.served_locally = 0
+
+    def sync(self, user_id: str, workflows: list[dict]) -> int:
+        """Replaces the user's compiled rules. Returns the number of locally decidable rules."""
+        compiled = compile_workflows(workflows)
+        self._rule_sets[user_id] = compiled
+        return len(compiled.rules)
+
+    def evaluate(self, user_id: str, subject: str, sender: str, body: str) -> Optional[CompiledRule]:
+        """Returns the first (in sync order) fully matching rule, or None if the AI must decide."""
+        self.evaluated += 1
+        compiled = self._rule_sets.get(user_id)
+        if compiled is None or not compiled.rules:
+            return None
+
+        hits: dict[int, int] = {}
+
+        def record(rule_ids):
+            for rule_id in rule_ids:
+                hits[rule_id] = hits.get(rule_id, 0) + 1
+
+        address = sender.strip().lower()
+        local_part, _, domain = address.rpartition("@")
+        record(compiled.by_address.get(address, ()))
+        record(compiled.by_local_part.get(local_part, ()))
+        # Match the domain and each parent domain (mail.example.com -> example.com -> com)
+        while domain:
+            record(compiled.by_domain.get(domain, ()))
+            domain = domain.partition(".")[2]
+        if compiled.subject_matcher:
+            record(compiled.subject_matcher.search(subject))
+        # Body scans are the only cost proportional to email size, so skip them
+        # unless a body rule could still complete
+        if compiled.body_matcher and any(
+            hits.get(rule_id, 0) == compiled.rules[rule_id].condition_count - 1
+            for rule_id in compiled.body_rule_ids
+        ):
+            record(compiled.body_matcher.search(body))
+
+        matched = [rule_id for rule_id, count in hits.items() if count == compiled.rules[rule_id].condition_count]
+        if not matched:
+            return None
+        self.served_locally += 1
+        return compiled.rules[min(matched)]
+
+    def stats(self) -> dict:
+        return {
+            "evaluated": self.evaluated,
+            "served_locally": self.served_locally,
+            "local_fraction": self.served_locally / self.evaluated if self.evaluated else 0.0,
+            "users": len(self._rule_sets),
+        }
@@ -0,0 +1,131 @@
+import json
+from typing import Any, Iterator
+
+# Fields emitted as soon as their value is complete
+DECISION_FIELDS = ("action", "confidence", "send_permission", "suggested_workflow_id")
+# String field streamed incrementally as it is generated
+STREAMED_FIELD = "reply_text"
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ToolArgumentsParser:
+    """
+    Incremental parser for the flat JSON object streamed in tool-call arguments.
+
+    Feed it argument fragments as they arrive; it yields ("field", name, value)
+    once a top-level value is complete and ("delta", STREAMED_FIELD, text) for
+    each decoded piece of the streamed string field.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._state = "start"
+        self._key = ""
+        self._chars: list[str] = []
+        self._escape = None  # Pending escape sequence (without the backslash), or None
+        self._pending_surrogate = ""
+        self._depth = 0
+
+    def feed(self, fragment: str) -> Iterator[tuple[str, str, Any]]:
+        self.buffer += fragment
+        for char in fragment:
+            yield from self._step(char)
+
+    def result(self) -> dict:
+        """Parses the complete arguments once the stream has finished."""
+        return json.loads(self.buffer)
+
+    def _step(self, char: str) -> Iterator[tuple[str, str, Any]]:
+        state = self._state
+        if state == "start":
+            if char == "{":
+                self._state = "key_or_end"
+        elif state == "key_or_end":
+            if char == '"':
+                self._chars = []
+                self._state = "key"
+            elif char == "}":
+                self._state = "done"
+        elif state == "key":
+            if self._escape is not None or char == "\\":
+                self._consume_escape(char)
+            elif char == '"':
+                self._key = "".join(self._chars)
+                self._state = "colon"
+            else:
+                self._chars.append(char)
+        elif state == "colon":
+            if char == ":":
+                self._state = "value"
+        elif state == "value":
+            if char == '"':
+                self._chars = []
+                self._state = "string"
+            elif char in "{[":
+                self._chars = [char]
+                self._depth = 1
+                self._state = "nested"
+            elif not char.isspace():
+                self._chars = [char]
+                self._state = "literal"
+        elif state == "string":
+            if self._escape is not None or char == "\\":
+                decoded = self._consume_escape(char)
+                if decoded and self._key == STREAMED_FIELD:
+                    yield ("delta", self._key, decoded)
+            elif char == '"':
+                yield ("field", self._key, "".join(self._chars))
+                self._state = "after_value"
+            else:
+                self._chars.append(char)
+                if self._key == STREAMED_FIELD:
+                    yield ("delta", self._key, char)
+        elif state == "literal":
+            if char in ",}" or char.isspace():
+                yield ("field", self._key, json.loads("".join(self._chars)))
+                self._state = "after_value"
+                yield from self._step(char)
+            else:
+                self._chars.append(char)
+        elif state == "nested":
+            # Nested values are not expected in the schema; capture them verbatim
+            self._chars.append(char)
+            if char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    yield ("field", self._key, json.loads("".join(self._chars)))
+                    self._state = "after_value"
+        elif state == "after_value":
+            if char == ",":
+                self._state = "key_or_end"
+            elif char == "}":
+                self._state = "done"
+
+    def _consume_escape(self, char: str) -> str:
+        """Advances a backslash escape; returns the decoded text once complete."""
+        if self._escape is None:
+            self._escape = ""
+            return ""
+        self._escape += char
+        if self._escape[0] != "u":
+            decoded = _SIMPLE_ESCAPES.get(self._escape, self._escape)
+        elif len(self._escape) < 5:
+            return ""
+        else:
+            code = int(self._escape[1:], 16)
+            if 0xD800 <= code <= 0xDBFF:
+                # High surrogate; wait for the low half
+                self._pending_surrogate = self._escape
+                self._escape = None
+                return ""
+            if self._pending_surrogate:
+                decoded = json.loads(f'"\\{self._pending_surrogate}\\{self._escape}"')
+                self._pending_surrogate = ""
+            else:
+                decoded = chr(code)
+        self._escape = None
+        self._chars.append(decoded)
+        return decoded
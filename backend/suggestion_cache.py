@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+# --- Configuration ---
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "10000"))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Optional SQLite file for a cache tier that survives restarts (disabled when unset)
+AI_CACHE_DB_PATH = os.getenv("AI_CACHE_DB_PATH")
+
+# Expired rows are deleted from the disk tier at most this often
+DISK_PURGE_INTERVAL_SECONDS = 600
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Collapses whitespace so trivially reformatted emails share a cache key."""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def make_cache_key(
+    model: str,
+    prompt_version: str,
+    system_prompt: str,
+    subject: str,
+    sender: str,
+    body: str,
+    thread_history: Optional[str],
+) -> str:
+    """Content-addressed key over everything that influences the AI suggestion."""
+    material = json.dumps(
+        [
+            model,
+            prompt_version,
+            _normalize(system_prompt),
+            _normalize(subject),
+            sender.strip().lower(),
+            _normalize(body),
+            _normalize(thread_history),
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """In-process LRU tier with per-entry TTL and entry/byte-size eviction."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, str, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.size_bytes -= size
+
+
+class SQLiteTier:
+    """Optional on-disk tier backed by a single SQLite table."""
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS suggestion_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS suggestion_cache_expires ON suggestion_cache (expires_at)")
+        self._conn.commit()
+        self._next_purge = 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM suggestion_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO suggestion_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + self.ttl),
+            )
+            if now >= self._next_purge:
+                self._conn.execute("DELETE FROM suggestion_cache WHERE expires_at < ?", (now,))
+                self._next_purge = now + DISK_PURGE_INTERVAL_SECONDS
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class _PendingCompute:
+    """A computation shared by every concurrent caller asking for the same key."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False
+
+
+class SuggestionCache:
+    """
+    Two-tier cache for serialized AI suggestions. Concurrent misses for the
+    same key are coalesced so only one upstream call is made.
+    """
+
+    def __init__(
+        self,
+        ttl: float = AI_CACHE_TTL_SECONDS,
+        max_entries: int = AI_CACHE_MAX_ENTRIES,
+        max_bytes: int = AI_CACHE_MAX_BYTES,
+        db_path: Optional[str] = AI_CACHE_DB_PATH,
+    ):
+        self.memory = MemoryTier(ttl, max_entries, max_bytes)
+        self.disk = SQLiteTier(db_path, ttl) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight: dict[str, _PendingCompute] = {}
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Returns the cached value for `key`, calling `compute` at most once across concurrent callers.
+
+        The computation runs in its own task, so a cancelled caller only stops
+        waiting; the shared computation is cancelled once no caller is left.
+        Failures are shared with the callers waiting at the time but never cached.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._in_flight.get(key)
+        if pending is not None and not pending.abandoned:
+            self.coalesced += 1
+        else:
+            pending = _PendingCompute(asyncio.create_task(self._fill(key, compute)))
+            self._in_flight[key] = pending
+            pending.task.add_done_callback(lambda task: self._finish(key, pending))
+
+        pending.waiters += 1
+        try:
+            return await asyncio.shield(pending.task)
+        except asyncio.CancelledError:
+            if pending.waiters == 1 and not pending.task.done():
+                pending.abandoned = True
+                pending.task.cancel()
+            raise
+        finally:
+            pending.waiters -= 1
+
+    async def _fill(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        value = None
+        if self.disk:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+            value = await compute()
+            self.memory.set(key, value)
+            if self.disk:
+                await asyncio.to_thread(self.disk.set, key, value)
+        return value
+
+    def _finish(self, key: str, pending: _PendingCompute) -> None:
+        if self._in_flight.get(key) is pending:
+            del self._in_flight[key]
+        if not pending.task.cancelled():
+            pending.task.exception()  # Mark retrieved so failures without waiters are not logged
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Returns a cached value without computing one on a miss."""
+        value = self.memory.get(key)
+        if value is None and self.disk:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def store(self, key: str, value: str) -> None:
+        """Stores a value computed outside of get_or_compute (e.g., from a streamed response)."""
+        self.memory.set(key, value)
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.memory.evictions,
+            "entries": len(self.memory),
+            "size_bytes": self.memory.size_bytes,
+        }
+
+    def close(self) -> None:
+        if self.disk:
+            self.disk.close()
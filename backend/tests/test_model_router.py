@@ -0,0 +1,230 @@
+"""
+Tests for model routing, confidence escalation and hedged requests, run
+against local stub clients with injected delays.
+
+    cd backend && python -m pytest -q tests
+"""
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import model_router
+from model_router import ModelRouter, Route
+
+FAST, STRONG = "gpt-4o-mini", "gpt-4o"
+
+
+class StubClient:
+    """Stands in for LLMClient: answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def create_chat_completion(self, model: str, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return SimpleNamespace(source=self.name, usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+
+    async def stream_chat_completion(self, model: str, **kwargs):
+        self.calls += 1
+        for i in range(3):
+            await asyncio.sleep(self.delay)
+            usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20) if i == 2 else None
+            yield SimpleNamespace(usage=usage)
+
+
+def make_router(primary=None, secondary=None, **kwargs) -> ModelRouter:
+    return ModelRouter(primary or StubClient("primary"), secondary, fast_model=FAST, strong_model=STRONG, **kwargs)
+
+
+@pytest.fixture
+def hedge_after(monkeypatch):
+    """Sets the hedge delay used before a model has enough latency samples."""
+    def set_delay(seconds: float):
+        monkeypatch.setattr(model_router, "AI_HEDGE_DEFAULT_DELAY_SECONDS", seconds)
+    return set_delay
+
+
+# --- Routing ---
+
+def test_short_email_goes_to_fast_model_with_escalation():
+    route = make_router().route("Can we move our call to Friday?", None)
+    assert route == Route(FAST, "default", escalation_model=STRONG)
+
+
+def test_auto_send_goes_to_strong_model():
+    route = make_router().route("Thanks, see you then.", None, action_mode="auto_send")
+    assert (route.model, route.reason, route.escalation_model) == (STRONG, "auto_send", None)
+
+
+def test_deep_thread_goes_to_strong_model():
+    history = "\n".join(f"On Mon, person{i}@example.com wrote:\n> earlier message {i}" for i in range(3))
+    route = make_router().route("Any update on this?", history)
+    assert (route.model, route.reason) == (STRONG, "deep_thread")
+
+
+def test_shallow_thread_stays_on_fast_model():
+    route = make_router().route("Any update on this?", "On Mon, a@example.com wrote:\n> hello")
+    assert route.model == FAST
+
+
+def test_long_email_goes_to_strong_model():
+    body = "word " * (model_router.AI_ROUTER_LONG_EMAIL_TOKENS * 2)
+    route = make_router().route(body, None)
+    assert (route.model, route.reason) == (STRONG, "long_email")
+
+
+def test_disabled_router_always_uses_fast_model_without_escalation():
+    route = make_router(enabled=False).route("Hi", None, action_mode="auto_send")
+    assert route == Route(FAST, "default")
+
+
+def test_routed_counter_is_per_model():
+    router = make_router()
+    router.route("Hi", None)
+    router.route("Hi", None, action_mode="auto_send")
+    router.route("Hi", None)
+    assert router.stats_for(FAST).routed == 2
+    assert router.stats_for(STRONG).routed == 1
+
+
+# --- Escalation ---
+
+def test_escalates_only_below_threshold():
+    router = make_router(escalation_confidence=0.6)
+    route = Route(FAST, "default", escalation_model=STRONG)
+    assert router.should_escalate(route, 0.59)
+    assert not router.should_escalate(route, 0.6)
+    assert not router.should_escalate(route, 0.95)
+    assert router.stats_for(FAST).escalations == 1
+
+
+def test_strong_routes_never_escalate():
+    router = make_router()
+    assert not router.should_escalate(Route(STRONG, "long_email"), 0.1)
+    assert router.stats_for(STRONG).escalations == 0
+
+
+# --- Hedging ---
+
+def test_no_hedge_without_secondary():
+    primary = StubClient("primary", delay=0.05)
+    router = make_router(primary)
+    response = asyncio.run(router.create_chat_completion(FAST, messages=[]))
+    assert response.source == "primary"
+    assert router.stats_for(FAST).hedged == 0
+
+
+def test_fast_primary_is_not_hedged(hedge_after):
+    hedge_after(0.2)
+    primary, secondary = StubClient("primary", delay=0.01), StubClient("secondary")
+    router = make_router(primary, secondary)
+    response = asyncio.run(router.create_chat_completion(FAST, messages=[]))
+    assert response.source == "primary"
+    assert secondary.calls == 0
+    assert router.stats_for(FAST).hedged == 0
+
+
+def test_hedge_fires_after_delay_and_first_success_wins(hedge_after):
+    hedge_after(0.05)
+    primary, secondary = StubClient("primary", delay=1.0), StubClient("secondary", delay=0.01)
+    router = make_router(primary, secondary)
+
+    async def run():
+        start = time.perf_counter()
+        response = await router.create_chat_completion(FAST, messages=[])
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0)  # Let the loser observe its cancellation
+        return response, elapsed
+
+    response, elapsed = asyncio.run(run())
+    assert response.source == "secondary"
+    assert 0.05 <= elapsed < 0.5
+    assert primary.cancelled == 1
+    stats = router.stats_for(FAST)
+    assert (stats.requests, stats.hedged, stats.hedge_wins, stats.errors) == (1, 1, 1, 0)
+    assert stats.latency.count == 1
+    assert stats.prompt_tokens == 100  # Only the winner's usage is counted
+
+
+def test_primary_wins_race_and_hedge_is_cancelled(hedge_after):
+    hedge_after(0.02)
+    primary, secondary = StubClient("primary", delay=0.05), StubClient("secondary", delay=1.0)
+    router = make_router(primary, secondary)
+
+    async def run():
+        response = await router.create_chat_completion(FAST, messages=[])
+        await asyncio.sleep(0)
+        return response
+
+    assert asyncio.run(run()).source == "primary"
+    assert secondary.calls == 1 and secondary.cancelled == 1
+    assert router.stats_for(FAST).hedge_wins == 0
+
+
+def test_slow_primary_failure_falls_back_to_hedge(hedge_after):
+    hedge_after(0.02)
+    primary = StubClient("primary", delay=0.05, error=RuntimeError("upstream 500"))
+    secondary = StubClient("secondary", delay=0.1)
+    router = make_router(primary, secondary)
+    response = asyncio.run(router.create_chat_completion(FAST, messages=[]))
+    assert response.source == "secondary"
+    assert router.stats_for(FAST).errors == 0
+
+
+def test_early_primary_failure_falls_back_to_hedge(hedge_after):
+    hedge_after(1.0)
+    primary = StubClient("primary", error=RuntimeError("upstream 500"))
+    secondary = StubClient("secondary", delay=0.01)
+    router = make_router(primary, secondary)
+    start = time.perf_counter()
+    response = asyncio.run(router.create_chat_completion(FAST, messages=[]))
+    assert response.source == "secondary"
+    assert time.perf_counter() - start < 0.5  # Did not wait for the hedge delay
+    assert router.stats_for(FAST).hedged == 1
+
+
+def test_both_failing_raises_first_error(hedge_after):
+    hedge_after(0.01)
+    primary = StubClient("primary", delay=0.02, error=RuntimeError("primary down"))
+    secondary = StubClient("secondary", delay=0.05, error=RuntimeError("secondary down"))
+    router = make_router(primary, secondary)
+    with pytest.raises(RuntimeError, match="primary down"):
+        asyncio.run(router.create_chat_completion(FAST, messages=[]))
+    assert router.stats_for(FAST).errors == 1
+
+
+def test_hedge_delay_tracks_recent_latency():
+    router = make_router(StubClient("primary"), StubClient("secondary"))
+    stats = router.stats_for(FAST)
+    stats.recent.extend(i / 100 for i in range(1, model_router.AI_HEDGE_MIN_SAMPLES + 81))
+    assert router.hedge_delay(FAST) == pytest.approx(0.95, abs=0.01)
+
+
+# --- Streaming ---
+
+def test_streamed_call_is_counted_without_consumer_time():
+    router = make_router(StubClient("primary", delay=0.01))
+
+    async def consume():
+        async for _ in router.stream_chat_completion(FAST, messages=[]):
+            await asyncio.sleep(0.1)  # A slow client reading the stream
+
+    asyncio.run(consume())
+    stats = router.stats_for(FAST)
+    assert stats.requests == 1
+    assert stats.latency.count == 1
+    assert stats.latency.sum < 0.1
+    assert (stats.prompt_tokens, stats.completion_tokens) == (100, 20)
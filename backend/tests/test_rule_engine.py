@@ -0,0 +1,115 @@
+"""
+Tests for compiling synced workflows into local rules and evaluating emails against them.
+
+    cd backend && python -m pytest -q tests
+"""
+from rule_engine import RuleEngine
+
+
+def workflow(rules: list[dict], action: str = "archive", action_mode: str = "draft_only", workflow_id: str = "wf") -> dict:
+    return {"workflow_id": workflow_id, "action": action, "action_mode": action_mode, "rules": rules}
+
+
+def engine_with(*workflows: dict) -> RuleEngine:
+    engine = RuleEngine()
+    engine.sync("u", list(workflows))
+    return engine
+
+
+def matches(engine: RuleEngine, sender: str, subject: str = "Hello", body: str = "Hi there") -> bool:
+    return engine.evaluate("u", subject, sender, body) is not None
+
+
+# --- Sender conditions ---
+
+def test_domain_rule_matches_domain_and_subdomains():
+    engine = engine_with(workflow([{"if_sender": "news.io"}]))
+    assert matches(engine, "a@news.io")
+    assert matches(engine, "a@mail.news.io")
+    assert not matches(engine, "a@notnews.io")
+    assert not matches(engine, "a@news.io.evil.com")
+
+
+def test_at_domain_rule_is_a_domain_rule():
+    engine = engine_with(workflow([{"if_sender": "@news.io"}]))
+    assert matches(engine, "a@news.io")
+    assert matches(engine, "A@Mail.News.io")
+    assert not matches(engine, "a@other.io")
+
+
+def test_full_address_rule_matches_only_that_address():
+    engine = engine_with(workflow([{"if_sender": "Boss@Corp.com"}]))
+    assert matches(engine, " boss@corp.com ")
+    assert not matches(engine, "intern@corp.com")
+    assert not matches(engine, "boss@mail.corp.com")
+
+
+def test_local_part_rule_matches_any_domain():
+    engine = engine_with(workflow([{"if_sender": "noreply@"}]))
+    assert matches(engine, "noreply@github.com")
+    assert matches(engine, "noreply@news.io")
+    assert not matches(engine, "reply@github.com")
+
+
+def test_blank_conditions_are_ignored():
+    engine = engine_with(workflow([{"if_subject_contains": "   "}, {"if_sender": "", "if_body_contains": " "}]))
+    assert not matches(engine, "a@b.com")
+
+
+# --- Keyword and multi-condition rules ---
+
+def test_multi_condition_rule_needs_every_condition():
+    engine = engine_with(workflow([{"if_sender": "@shop.com", "if_subject_contains": "Receipt", "if_body_contains": "order"}]))
+    assert matches(engine, "a@shop.com", subject="Your receipt", body="Order #42 shipped")
+    assert not matches(engine, "a@shop.com", subject="Your receipt", body="Thanks!")
+    assert not matches(engine, "a@shop.com", subject="Sale", body="Order now")
+    assert not matches(engine, "a@other.com", subject="Your receipt", body="Order #42")
+
+
+def test_alternative_rules_in_one_workflow():
+    engine = engine_with(workflow([{"if_subject_contains": "unsubscribe"}, {"if_sender": "noreply@"}]))
+    assert matches(engine, "a@b.com", subject="Click to unsubscribe")
+    assert matches(engine, "noreply@b.com")
+    assert not matches(engine, "a@b.com")
+
+
+def test_first_synced_workflow_wins():
+    engine = engine_with(
+        workflow([{"if_sender": "news.io"}], action="flag_for_review", workflow_id="first"),
+        workflow([{"if_sender": "news.io"}], action="archive", workflow_id="second"),
+    )
+    assert engine.evaluate("u", "Hi", "a@news.io", "").workflow_id == "first"
+
+
+def test_unsupported_conditions_and_actions_are_left_to_the_ai():
+    engine = engine_with(
+        workflow([{"if_sender": "news.io", "if_attachment": "pdf"}]),
+        workflow([{"if_sender": "corp.com"}], action="draft_reply"),
+    )
+    assert not matches(engine, "a@news.io")
+    assert not matches(engine, "a@corp.com")
+
+
+def test_body_scan_is_skipped_unless_a_body_rule_can_complete():
+    engine = engine_with(workflow([{"if_sender": "@shop.com", "if_body_contains": "order"}]))
+    matcher = engine._rule_sets["u"].body_matcher
+    scanned = []
+    original_search = matcher.search
+    matcher.search = lambda text: scanned.append(text) or original_search(text)
+
+    assert not matches(engine, "a@other.com", body="order")
+    assert scanned == []
+    assert matches(engine, "a@shop.com", body="order")
+    assert scanned == ["order"]
+
+
+# --- Send permission ---
+
+def test_send_permission_follows_action_mode():
+    engine = engine_with(workflow([{"if_sender": "news.io"}], action_mode="auto_send"))
+    assert engine.evaluate("u", "Hi", "a@news.io", "").send_permission == "auto_send"
+
+
+def test_flag_for_review_always_needs_review():
+    engine = engine_with(workflow([{"if_sender": "news.io"}], action="flag_for_review", action_mode="auto_send"))
+    assert engine.evaluate("u", "Hi", "a@news.io", "").send_permission == "needs_review"